@@ -1,26 +1,247 @@
-from fastapi import FastAPI, HTTPException
+import time
+from startup import StartupReport
+
+# Created before the heavier imports so the report covers them too
+startup_report = StartupReport()
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel
-import onnxruntime as ort
+from starlette.requests import ClientDisconnect
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import math
+import secrets
+import threading
 import numpy as np
 import os
-from mock_model import MockModel
+from inference import run_batch
+from registry import WARMUP_ROW, ModelRegistry, engines_from_env, models_from_env, warmup
+from explain import Explainer, parse_baseline
+from prediction_grid import GridModel, parse_grid
+from batcher import MicroBatcher
+from executor import ClientDisconnected, DeadlineExceeded, InferenceExecutor, Overloaded
+import columnar
+from metrics import BATCH_SIZE_BUCKETS, MetricsRegistry
+from cache import LRUBackend, PredictionCache, SharedMemoryBackend, parse_quantization, predict_cached
+from feature_schema import DEFAULT_SCHEMA_PATH, FeatureSchema, drop_row
+from capture import TrafficCapture
+from profiler import SamplingProfiler, profile_path
+from responses import FORMAT_COMPACT, FORMAT_NESTED, NumpyJSONResponse, prediction_response, predictions_response
+from streaming import NDJSON_CONTENT_TYPE, DuplexStreamingResponse, OversizedLine, PredictionStream, encode_results, ndjson_lines
 
-app = FastAPI(title="ML Prediction API", description="FastAPI backend for ONNX model inference")
+# Upper bound on rows accepted by /predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100000"))
 
-# Load model once
-session = None
-try:
-    # Simple model loading without complex options
-    session = ort.InferenceSession("working_agricultural_model.onnx")
-    print("Model loaded successfully")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    try:
-        print("Using mock model for testing...")
-        session = MockModel()
-    except Exception as e2:
-        print(f"Mock model also failed: {e2}")
-        session = None
+# Shape of /predict responses unless a request sends X-Response-Format: nested for [[x]] or compact for [x]
+RESPONSE_FORMAT = os.getenv("RESPONSE_FORMAT", FORMAT_NESTED)
+
+# Micro-batching settings for /predict
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "1") == "1"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2"))
+
+# Inference executor, admission queue and deadlines
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(min(4, os.cpu_count() or 1))))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "1024"))
+LOAD_SHED_STATUS = int(os.getenv("LOAD_SHED_STATUS", "503"))
+LOAD_SHED_RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", "1"))
+REQUEST_TIMEOUT_MS = float(os.getenv("REQUEST_TIMEOUT_MS", "5000"))
+MAX_REQUEST_TIMEOUT_MS = float(os.getenv("MAX_REQUEST_TIMEOUT_MS", "30000"))
+
+# Feature names, dtypes and valid ranges shared by every input path
+FEATURE_SCHEMA = FeatureSchema.load(os.getenv("FEATURE_SCHEMA", DEFAULT_SCHEMA_PATH))
+FEATURE_RANGE_CHECKS = os.getenv("FEATURE_RANGE_CHECKS", "1") == "1"
+
+# Streaming endpoints: batching window and how many batches a stream may have in flight
+STREAM_WINDOW_MS = float(os.getenv("STREAM_WINDOW_MS", "10"))
+STREAM_MAX_BATCH_SIZE = int(os.getenv("STREAM_MAX_BATCH_SIZE", "256"))
+STREAM_MAX_IN_FLIGHT = int(os.getenv("STREAM_MAX_IN_FLIGHT", "4"))
+# Longest streamed record line, longer lines are dropped and reported as an error record
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+
+# Feature attributions from /predict/explain, relative to the baseline row
+EXPLAIN_BASELINE = parse_baseline(os.getenv("EXPLAIN_BASELINE", ""), WARMUP_ROW)
+EXPLAIN_MAX_BATCH_SIZE = int(os.getenv("EXPLAIN_MAX_BATCH_SIZE", "1000"))
+# str() of a float32 gives the shortest decimal, so 0.3 is reported as 0.3
+EXPLAIN_BASELINE_RECORD = {name: float(str(value)) for name, value in zip(FEATURE_SCHEMA.names, EXPLAIN_BASELINE)}
+
+# Predictions precomputed over a grid of feature values, off unless PREDICTION_GRID is set
+PREDICTION_GRID = parse_grid(os.getenv("PREDICTION_GRID", ""))
+PREDICTION_GRID_INTERPOLATE = os.getenv("PREDICTION_GRID_INTERPOLATE", "0") == "1"
+PREDICTION_GRID_MAX_CELLS = int(os.getenv("PREDICTION_GRID_MAX_CELLS", "10000000"))
+
+# Sampled request capture for replay, off unless CAPTURE_PATH is set
+CAPTURE_PATH = os.getenv("CAPTURE_PATH", "")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "0.1"))
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", str(100 * 1024 * 1024)))
+CAPTURE_BACKUPS = int(os.getenv("CAPTURE_BACKUPS", "5"))
+
+# On-demand profiling through the /admin/profile endpoints
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+# Prediction cache settings
+PREDICTION_CACHE = os.getenv("PREDICTION_CACHE", "1") == "1"
+PREDICTION_CACHE_BACKEND = os.getenv("PREDICTION_CACHE_BACKEND", "lru")
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+PREDICTION_CACHE_QUANTIZATION = parse_quantization(os.getenv("PREDICTION_CACHE_QUANTIZATION", ""))
+
+# Models served by the registry, as name=path pairs in MODELS
+MOCK_MODEL = os.getenv("MOCK_MODEL", "0") == "1"
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Startup: batch sizes every model is warmed with, and whether to accept connections before warmup ends
+WARMUP_BATCH_SIZES = tuple(int(size) for size in os.getenv("WARMUP_BATCH_SIZES", f"1,8,{MICRO_BATCH_MAX_SIZE},512").split(",") if size.strip())
+BACKGROUND_STARTUP = os.getenv("BACKGROUND_STARTUP", "0") == "1"
+
+# Serve the variant optimize_model.py selected for each model, when its report is current
+OPTIMIZED_MODELS = os.getenv("OPTIMIZED_MODELS", "1") == "1"
+
+# ONNX Runtime models run batches up to this size through reusable IOBinding buffers, 0 disables them
+BUFFER_POOL_MAX_ROWS = int(os.getenv("BUFFER_POOL_MAX_ROWS", str(MICRO_BATCH_MAX_SIZE)))
+
+registry = ModelRegistry(
+    warmup_batch_sizes=WARMUP_BATCH_SIZES,
+    use_optimized=OPTIMIZED_MODELS,
+    buffer_pool_rows=BUFFER_POOL_MAX_ROWS,
+    grid_axes=PREDICTION_GRID,
+    grid_interpolate=PREDICTION_GRID_INTERPOLATE,
+    grid_max_cells=PREDICTION_GRID_MAX_CELLS
+)
+model_specs = models_from_env()
+model_engines = engines_from_env([model_name for model_name, _ in model_specs])
+for model_name, model_path in model_specs:
+    registry.register(model_name, model_path, model_engines[model_name])
+if MOCK_MODEL:
+    registry.register_mock("mock")
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL") or registry.names()[0]
+
+def _make_cache(name):
+    if PREDICTION_CACHE_BACKEND == "shared":
+        backend = SharedMemoryBackend(name=f"agri_prediction_cache_{name}", slots=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL)
+    else:
+        backend = LRUBackend(max_entries=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL)
+    return PredictionCache(backend, PREDICTION_CACHE_QUANTIZATION)
+
+# Cache predictions for repeated feature vectors, one cache per model
+caches = {}
+if PREDICTION_CACHE:
+    caches = {name: _make_cache(name) for name in registry.names()}
+
+def _invalidate_cache(entry):
+    cache = caches.get(entry.name)
+    if cache is not None and cache.model_version != entry.version:
+        cache.invalidate(entry.version)
+
+registry.add_listener(_invalidate_cache)
+
+# Prometheus metrics for the inference path
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter("predict_requests_total", "Prediction requests by model, endpoint and status code", ["model", "endpoint", "status"])
+REQUEST_SECONDS = metrics.histogram("predict_request_seconds", "Handler time per prediction request", ["model", "endpoint"])
+STAGE_SECONDS = metrics.histogram("predict_stage_seconds", "Time spent in each stage of a prediction request", ["model", "stage"])
+INFERENCE_ROWS = metrics.histogram("inference_batch_rows", "Rows per session.run call", ["model"], buckets=BATCH_SIZE_BUCKETS)
+QUEUE_WAIT_SECONDS = metrics.histogram("micro_batch_queue_wait_seconds", "Time a request waited in the micro-batch queue", ["model"])
+MICRO_BATCH_ROWS = metrics.histogram("micro_batch_rows", "Rows per micro-batch flush", ["model"], buckets=BATCH_SIZE_BUCKETS)
+STREAM_RECORDS = metrics.counter("stream_records_total", "Records received on streaming endpoints by outcome", ["model", "protocol", "outcome"])
+
+def _score(entry, columns):
+    """Run the model on six feature columns and record the run stage"""
+    start = time.perf_counter()
+    result = run_batch(entry.session, columns)
+    STAGE_SECONDS.observe(time.perf_counter() - start, (entry.name, "run"))
+    INFERENCE_ROWS.observe(len(columns[0]), (entry.name,))
+    return result
+
+def _run_current(name):
+    """Inference function that always uses the model version current at call time"""
+    def run(columns):
+        entry = registry.get(name)
+        if entry is None:
+            raise RuntimeError(f"Model '{name}' is not loaded")
+        return _score(entry, columns)
+    return run
+
+def _record_flush(name):
+    labels = (name,)
+    def on_flush(batch_size, queue_waits):
+        MICRO_BATCH_ROWS.observe(batch_size, labels)
+        for wait in queue_waits:
+            QUEUE_WAIT_SECONDS.observe(wait, labels)
+    return on_flush
+
+# Model calls run on their own pool instead of Starlette's shared threadpool
+inference_executor = InferenceExecutor(
+    max_workers=INFERENCE_THREADS,
+    max_pending=INFERENCE_MAX_PENDING,
+    retry_after=LOAD_SHED_RETRY_AFTER
+)
+
+# Merge concurrent /predict calls into batched model runs
+batchers = {}
+if MICRO_BATCHING:
+    batchers = {
+        name: MicroBatcher(
+            _run_current(name),
+            max_batch_size=MICRO_BATCH_MAX_SIZE,
+            max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+            on_flush=_record_flush(name),
+            executor=inference_executor
+        )
+        for name in registry.names()
+    }
+
+# Values owned by other components are read when /metrics is scraped
+metrics.callback("micro_batch_queue_depth", "Requests waiting in the micro-batch queue", "gauge", ["model"],
+                 lambda: {(name,): batcher.queue_depth() for name, batcher in batchers.items()})
+metrics.callback("inference_pending_requests", "Requests admitted to the inference path and not yet finished", "gauge", [],
+                 lambda: {(): inference_executor.pending})
+metrics.callback("inference_shed_total", "Requests rejected or dropped by the inference executor", "counter", ["reason"],
+                 lambda: {("overloaded",): inference_executor.rejected, ("deadline",): inference_executor.timed_out, ("disconnected",): inference_executor.disconnected})
+metrics.callback("prediction_cache_hits_total", "Rows served from the prediction cache", "counter", ["model"],
+                 lambda: {(name,): cache.hits for name, cache in caches.items()})
+metrics.callback("prediction_cache_misses_total", "Rows that missed the prediction cache", "counter", ["model"],
+                 lambda: {(name,): cache.misses for name, cache in caches.items()})
+metrics.callback("prediction_cache_entries", "Entries held in the prediction cache", "gauge", ["model"],
+                 lambda: {(name,): len(cache.backend) for name, cache in caches.items()})
+def _grid_models():
+    for name in registry.names():
+        entry = registry.get(name)
+        if entry is not None and isinstance(entry.session, GridModel):
+            yield name, entry.session
+
+metrics.callback("prediction_grid_hits_total", "Rows answered from the prediction grid", "counter", ["model"],
+                 lambda: {(name,): model.hits for name, model in _grid_models()})
+metrics.callback("prediction_grid_misses_total", "Rows off the prediction grid that were scored live", "counter", ["model"],
+                 lambda: {(name,): model.misses for name, model in _grid_models()})
+# Open streams per protocol, only changed on the event loop
+active_streams = {"ndjson": 0, "websocket": 0}
+metrics.callback("stream_connections", "Open streaming prediction connections", "gauge", ["protocol"],
+                 lambda: {(protocol,): count for protocol, count in active_streams.items()})
+metrics.callback("model_info", "Currently loaded version of each model", "gauge", ["model", "version", "kind"],
+                 lambda: {(name, entry.version, entry.kind): 1 for name, entry in ((name, registry.get(name)) for name in registry.names()) if entry is not None})
+metrics.callback("model_loaded_timestamp_seconds", "Unix time the current version of each model was loaded", "gauge", ["model"],
+                 lambda: {(name,): entry.loaded_at for name, entry in ((name, registry.get(name)) for name in registry.names()) if entry is not None})
+
+# Sampled traffic for replay.py, written off the request path
+capture = None
+if CAPTURE_PATH:
+    capture = TrafficCapture(CAPTURE_PATH, sample_rate=CAPTURE_SAMPLE_RATE, max_bytes=CAPTURE_MAX_BYTES, backups=CAPTURE_BACKUPS)
+    metrics.callback("traffic_capture_records_total", "Sampled requests written to or dropped from the capture file", "counter", ["outcome"],
+                     lambda: {("written",): capture.written, ("dropped",): capture.dropped})
+
+# Profilers only run between the admin start and stop calls
+python_profiler = SamplingProfiler(PROFILE_DIR, interval=PROFILE_SAMPLE_INTERVAL_MS / 1000.0, max_seconds=PROFILE_MAX_SECONDS)
+onnx_profile_timers = {}
+
+metrics.callback("startup_phase_seconds", "Wall time of each startup phase of this process", "gauge", ["phase"],
+                 lambda: {(name,): seconds for name, seconds in startup_report.phases})
 
 class InputData(BaseModel):
     rainfall: float
@@ -42,37 +263,711 @@ class InputData(BaseModel):
             }
         }
 
+def _request_body(json_schema):
+    """OpenAPI request body for endpoints that also accept binary columnar input"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": json_schema},
+                columnar.FLOAT32_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+                columnar.ARROW_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}}
+            }
+        }
+    }
+
+def _load_json(body):
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ["body", getattr(e, "pos", 0)], "msg": "JSON decode error", "input": {}, "ctx": {"error": getattr(e, "msg", str(e))}}])
+
+def _validated(columns, errors, loc=("body",), single=False):
+    """Columns that passed the type and range checks, or a 422 listing the failing rows and features"""
+    if not errors and FEATURE_RANGE_CHECKS:
+        errors, _ = FEATURE_SCHEMA.range_errors(columns, loc)
+        if single:
+            drop_row(errors, len(loc))
+    if errors:
+        raise RequestValidationError(errors)
+    return columns
+
+def _parse_single(body):
+    """[6, 1] columns from a JSON record, checked against the feature schema"""
+    return _single_columns(_load_json(body))
+
+def _single_columns(payload):
+    columns, errors = FEATURE_SCHEMA.columns_from_record(payload, ("body",))
+    return _validated(columns, errors, single=True)
+
+def _is_batch(payload):
+    return isinstance(payload, dict) and ("records" in payload or "columns" in payload)
+
+def _parse_batch(body):
+    """[6, N] columns from {"records": [...]} or {"columns": {"feature": [...]}}, checked against the feature schema"""
+    return _batch_columns(_load_json(body))
+
+def _batch_columns(payload, max_rows=MAX_BATCH_SIZE):
+    if isinstance(payload, dict) and "columns" in payload:
+        # Columnar JSON maps straight onto the arrays without touching individual rows
+        loc = ("body", "columns")
+        columns, errors = FEATURE_SCHEMA.columns_from_mapping(payload["columns"], loc)
+    elif isinstance(payload, dict) and "records" in payload:
+        if isinstance(payload["records"], list) and len(payload["records"]) > max_rows:
+            raise HTTPException(status_code=413, detail=f"Batch size exceeds limit of {max_rows}")
+        loc = ("body", "records")
+        columns, errors = FEATURE_SCHEMA.columns_from_records(payload["records"], loc)
+    else:
+        raise RequestValidationError([{"type": "missing", "loc": ["body", "records"], "msg": "Field required", "input": None}])
+    return _validated(columns, errors, loc)
+
+async def _read_columns(request):
+    """Decode a binary request body into six feature columns"""
+    layout = request.headers.get("x-feature-layout", columnar.LAYOUT_COLUMNS)
+    try:
+        return columnar.decode(request.headers.get("content-type"), await request.body(), layout)
+    except columnar.ColumnarFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _response_type(request):
+    """Binary media type the client asked for, or None for JSON, checked before any work is done"""
+    try:
+        return columnar.binary_response_type(request.headers.get("accept"))
+    except columnar.ColumnarFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+def _current_entry(name):
+    try:
+        entry = registry.get(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{name}'")
+    if entry is None:
+        raise HTTPException(status_code=503, detail=f"Model '{name}' is not loaded")
+    return entry
+
+def _positive_duration(value, name):
+    """A duration from the client, which has to be a positive finite number"""
+    # NaN would never expire and zero or less would expire before any work, both are client errors
+    if not math.isfinite(value) or value <= 0:
+        raise HTTPException(status_code=400, detail=f"{name} must be a positive number")
+    return value
+
+def _request_timeout(request):
+    """Seconds allowed for a request, from X-Request-Timeout-Ms capped by the server maximum"""
+    timeout_ms = REQUEST_TIMEOUT_MS
+    header = request.headers.get("x-request-timeout-ms")
+    if header:
+        try:
+            timeout_ms = float(header)
+        except ValueError:
+            timeout_ms = math.nan
+        timeout_ms = _positive_duration(timeout_ms, "X-Request-Timeout-Ms")
+    return min(timeout_ms, MAX_REQUEST_TIMEOUT_MS) / 1000.0
+
+# Set once startup has loaded and warmed the models, cleared again on shutdown
+ready = threading.Event()
+
+def _warm_thread():
+    """Warmup runs per model on the calling inference thread, which also fills its buffer pool"""
+    for name in registry.names():
+        entry = registry.get(name)
+        if entry is not None:
+            warmup(entry.session, WARMUP_BATCH_SIZES)
+
+def _warm_request_path():
+    """Exercise request validation and response encoding once, they initialize lazily too"""
+    example = InputData.model_config["json_schema_extra"]["example"]
+    _parse_single(json.dumps(example))
+    columns = _parse_batch(json.dumps({"records": [example] * 2}))
+    predictions_response(columns[0])
+    prediction_response(columns[0][:1], RESPONSE_FORMAT)
+
+def _startup():
+    """Load and warm everything the first request would otherwise pay for"""
+    for name in registry.names():
+        registry.load(name)
+        entry = registry.get(name)
+        if entry is not None:
+            for step, seconds in entry.timings.items():
+                startup_report.record(f"{name}: {step}", seconds)
+    with startup_report.phase("inference threads"):
+        inference_executor.warm(_warm_thread)
+    with startup_report.phase("request path"):
+        _warm_request_path()
+    if MODEL_WATCH_INTERVAL > 0:
+        registry.watch(MODEL_WATCH_INTERVAL)
+    ready.set()
+    startup_report.finish()
+
+@asynccontextmanager
+async def lifespan(app):
+    if capture is not None:
+        capture.start()
+    startup = asyncio.ensure_future(asyncio.to_thread(_startup))
+    # In the background the server listens right away and /ready reports when warmup is done
+    if not BACKGROUND_STARTUP:
+        await startup
+    yield
+    ready.clear()
+    registry.stop()
+    for batcher in batchers.values():
+        await batcher.stop()
+    inference_executor.shutdown()
+    for timer in onnx_profile_timers.values():
+        timer.cancel()
+    if capture is not None:
+        capture.close()
+    for cache in caches.values():
+        cache.close()
+
+app = FastAPI(title="ML Prediction API", description="FastAPI backend for ONNX model inference", lifespan=lifespan)
+
+# Status codes for requests shed by the inference executor
+SHED_STATUS = {Overloaded: LOAD_SHED_STATUS, DeadlineExceeded: 504, ClientDisconnected: 499}
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc):
+    return JSONResponse(
+        {"detail": "Server is overloaded, retry later"},
+        status_code=LOAD_SHED_STATUS,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_handler(request, exc):
+    return JSONResponse({"detail": "Prediction did not finish before the request deadline"}, status_code=504)
+
+@app.exception_handler(ClientDisconnected)
+async def disconnected_handler(request, exc):
+    # Nobody is listening any more, the status only shows up in logs and metrics
+    return Response(status_code=499)
+
+def require_admin(x_admin_token: str = Header(None)):
+    # Admin endpoints reload and swap models, so without a configured token they stay closed
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+async def _predict_one(request, model_name):
+    entry = _current_entry(model_name)
+    deadline = time.perf_counter() + _request_timeout(request)
+    response_type = _response_type(request)
+
+    # Prepare input data for the model, from JSON or a packed binary body
+    stage_start = time.perf_counter()
+    binary = columnar.is_binary(request.headers.get("content-type"))
+    if binary:
+        columns = await _read_columns(request)
+        if len(columns[0]) != 1:
+            raise HTTPException(status_code=400, detail="/predict takes exactly one row, use /predict/batch for more")
+        columns = _validated(columns, [], single=True)
+    else:
+        columns = _parse_single(await request.body())
+    parsed = time.perf_counter()
+    STAGE_SECONDS.observe(parsed - stage_start, (model_name, "parse"))
+
+    row = np.array([column[0] for column in columns], dtype=np.float32)
+    stage_start = time.perf_counter()
+    STAGE_SECONDS.observe(stage_start - parsed, (model_name, "build"))
+
+    cache = caches.get(model_name)
+    batcher = batchers.get(model_name)
+    try:
+        # Serve repeated readings from the cache before queueing for the model
+        keys = None
+        result = None
+        if cache is not None:
+            keys = cache.keys(row.reshape(-1, 1))
+            values, missing = cache.lookup(keys)
+            if not missing:
+                result = np.stack(values)
+            now = time.perf_counter()
+            STAGE_SECONDS.observe(now - stage_start, (model_name, "cache"))
+            stage_start = now
+
+        # Run inference, shedding load when too many requests are already waiting
+        if result is None:
+            with inference_executor.admit():
+                if batcher is not None:
+                    work = batcher.submit(row)
+                else:
+                    work = inference_executor.run(_score, entry, row.reshape(-1, 1))
+                result = await inference_executor.wait(work, deadline - time.perf_counter(), request)
+            if keys is not None:
+                cache.store(keys, result)
+            now = time.perf_counter()
+            STAGE_SECONDS.observe(now - stage_start, (model_name, "inference"))
+            stage_start = now
+    except (Overloaded, DeadlineExceeded, ClientDisconnected):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Prediction error: {str(e)}")
+
+    if response_type is not None:
+        response = Response(content=columnar.encode(response_type, result), media_type=response_type)
+    else:
+        # Encoded from the float32 buffer, the float32 values are written in their shortest form
+        response_format = request.headers.get("x-response-format", RESPONSE_FORMAT)
+        if response_format not in (FORMAT_NESTED, FORMAT_COMPACT):
+            raise HTTPException(status_code=400, detail=f"X-Response-Format must be {FORMAT_NESTED} or {FORMAT_COMPACT}")
+        response = prediction_response(result, response_format)
+    STAGE_SECONDS.observe(time.perf_counter() - stage_start, (model_name, "serialize"))
+    return response
+
+async def _predict_many(request, model_name):
+    entry = _current_entry(model_name)
+    deadline = time.perf_counter() + _request_timeout(request)
+    response_type = _response_type(request)
+
+    # Binary bodies are mapped onto the feature columns without building records
+    stage_start = time.perf_counter()
+    binary = columnar.is_binary(request.headers.get("content-type"))
+    if binary:
+        columns = await _read_columns(request)
+    else:
+        columns = _parse_batch(await request.body())
+    if len(columns[0]) == 0:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one record")
+    if len(columns[0]) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds limit of {MAX_BATCH_SIZE}")
+    if binary:
+        columns = _validated(columns, [])
+    # The columns are assembled while parsing, so the batch path has no separate build stage
+    parsed = time.perf_counter()
+    STAGE_SECONDS.observe(parsed - stage_start, (model_name, "parse"))
+    stage_start = parsed
+
+    cache = caches.get(model_name)
+    try:
+        # One contiguous [N, 1] array per feature, scored in a single session.run
+        with inference_executor.admit():
+            if cache is not None:
+                work = inference_executor.run(predict_cached, cache, columns, lambda miss_columns: _score(entry, miss_columns))
+            else:
+                work = inference_executor.run(_score, entry, columns)
+            result = await inference_executor.wait(work, deadline - time.perf_counter(), request)
+    except (Overloaded, DeadlineExceeded, ClientDisconnected):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Prediction error: {str(e)}")
+    now = time.perf_counter()
+    STAGE_SECONDS.observe(now - stage_start, (model_name, "inference"))
+    stage_start = now
+
+    if response_type is not None:
+        response = Response(content=columnar.encode(response_type, result), media_type=response_type)
+    else:
+        response = predictions_response(result)
+    STAGE_SECONDS.observe(time.perf_counter() - stage_start, (model_name, "serialize"))
+    return response
+
+# Explainer per model, rebuilt when a new version is swapped in
+explainers = {}
+
+def _explain(entry, columns):
+    """Runs on an inference thread, so building the explainer and scoring its coalitions stay off the event loop"""
+    cached = explainers.get(entry.name)
+    if cached is None or cached[0] is not entry:
+        cached = explainers[entry.name] = (entry, Explainer.for_model(entry.session, entry.artifact, EXPLAIN_BASELINE))
+    explainer = cached[1]
+    start = time.perf_counter()
+    result = explainer.explain(columns)
+    STAGE_SECONDS.observe(time.perf_counter() - start, (entry.name, "run"))
+    return explainer.method, result
+
+def _contribution(values):
+    return values[0] if len(values) == 1 else values
+
+async def _predict_explain(request, model_name):
+    entry = _current_entry(model_name)
+    deadline = time.perf_counter() + _request_timeout(request)
+
+    # One record, or a batch in any of the forms /predict/batch takes
+    stage_start = time.perf_counter()
+    single = False
+    if columnar.is_binary(request.headers.get("content-type")):
+        columns = _validated(await _read_columns(request), [])
+    else:
+        payload = _load_json(await request.body())
+        single = not _is_batch(payload)
+        columns = _single_columns(payload) if single else _batch_columns(payload, EXPLAIN_MAX_BATCH_SIZE)
+    if len(columns[0]) == 0:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one record")
+    if len(columns[0]) > EXPLAIN_MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds limit of {EXPLAIN_MAX_BATCH_SIZE}")
+    parsed = time.perf_counter()
+    STAGE_SECONDS.observe(parsed - stage_start, (model_name, "parse"))
+
+    try:
+        # Every coalition of every row is scored in one call, never one model call per perturbation
+        with inference_executor.admit():
+            work = inference_executor.run(_explain, entry, columns)
+            method, (predictions, baseline_prediction, contributions) = await inference_executor.wait(work, deadline - time.perf_counter(), request)
+    except (Overloaded, DeadlineExceeded, ClientDisconnected):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Explanation error: {str(e)}")
+    stage_start = time.perf_counter()
+    STAGE_SECONDS.observe(stage_start - parsed, (model_name, "inference"))
+
+    explanations = [
+        {
+            "prediction": _contribution(prediction),
+            "contributions": {feature: _contribution(values) for feature, values in zip(FEATURE_SCHEMA.names, row)}
+        }
+        for prediction, row in zip(predictions.tolist(), contributions.tolist())
+    ]
+    body = {
+        "method": method,
+        "baseline": EXPLAIN_BASELINE_RECORD,
+        "baseline_prediction": _contribution(baseline_prediction.tolist())
+    }
+    if single:
+        body.update(explanations[0])
+    else:
+        body.update({"explanations": explanations, "count": len(explanations)})
+    response = NumpyJSONResponse(body)
+    STAGE_SECONDS.observe(time.perf_counter() - stage_start, (model_name, "serialize"))
+    return response
+
+def _stream_row(line):
+    """Validate one streamed record into a [6] float32 row"""
+    try:
+        columns = _parse_single(line)
+    except RequestValidationError as e:
+        # A decode error's location is a character offset, not a field
+        raise ValueError("; ".join(error["msg"] if error["type"] == "json_invalid" else f"{'.'.join(str(part) for part in error['loc'][1:]) or 'record'}: {error['msg']}" for error in e.errors()))
+    return columns[:, 0]
+
+def _prediction_stream(model_name, timeout):
+    run = _run_current(model_name)
+    cache = caches.get(model_name)
+
+    async def predict(columns):
+        # Each batch is admitted and bounded by the deadline like a unary request, a shed batch reports its error per record
+        with inference_executor.admit():
+            if cache is not None:
+                work = inference_executor.run(predict_cached, cache, columns, run)
+            else:
+                work = inference_executor.run(run, columns)
+            return await inference_executor.wait(work, timeout)
+
+    return PredictionStream(_stream_row, predict, STREAM_WINDOW_MS, STREAM_MAX_BATCH_SIZE, STREAM_MAX_IN_FLIGHT)
+
+def _count_stream_results(model_name, protocol, results):
+    errors = sum(1 for result in results if "error" in result)
+    if errors:
+        STREAM_RECORDS.inc((model_name, protocol, "error"), errors)
+    if len(results) > errors:
+        STREAM_RECORDS.inc((model_name, protocol, "scored"), len(results) - errors)
+
+async def _stream_ndjson(request, model_name):
+    _current_entry(model_name)
+    timeout = _request_timeout(request)
+    # A new stream is shed with the same 503 as a unary request while the queue is full
+    inference_executor.check()
+    stream = _prediction_stream(model_name, timeout)
+
+    async def body():
+        active_streams["ndjson"] += 1
+        try:
+            # Results go out while the request body is still arriving
+            async for results in stream.run(ndjson_lines(request.stream(), STREAM_MAX_LINE_BYTES)):
+                _count_stream_results(model_name, "ndjson", results)
+                yield encode_results(results)
+        except ClientDisconnect:
+            pass
+        finally:
+            active_streams["ndjson"] -= 1
+
+    return DuplexStreamingResponse(body(), media_type=NDJSON_CONTENT_TYPE)
+
+async def _stream_websocket(websocket, model_name):
+    try:
+        _current_entry(model_name)
+        timeout = _request_timeout(websocket)
+    except HTTPException as e:
+        await websocket.close(code=1008 if e.status_code in (400, 404) else 1013, reason=e.detail)
+        return
+    try:
+        inference_executor.check()
+    except Overloaded:
+        await websocket.close(code=1013, reason="Server is overloaded, retry later")
+        return
+    await websocket.accept()
+    stream = _prediction_stream(model_name, timeout)
+
+    async def lines():
+        # Each message holds one or more NDJSON records, iteration ends when the client disconnects
+        async for message in websocket.iter_text():
+            for line in message.splitlines():
+                if len(line.encode()) > STREAM_MAX_LINE_BYTES:
+                    yield OversizedLine(STREAM_MAX_LINE_BYTES)
+                elif line.strip():
+                    yield line
+
+    active_streams["websocket"] += 1
+    try:
+        async for results in stream.run(lines()):
+            _count_stream_results(model_name, "websocket", results)
+            await websocket.send_text(encode_results(results))
+    except (WebSocketDisconnect, RuntimeError):
+        # The client went away while results were still being sent
+        pass
+    finally:
+        active_streams["websocket"] -= 1
+
+async def _observe(handler, request, model_name, endpoint):
+    """Run a predict handler, counting the outcome and timing the whole request"""
+    start = time.perf_counter()
+    captured = capture is not None and capture.sample()
+    started_at = time.time() if captured else None
+    status = 500
+    try:
+        response = await handler(request, model_name)
+        status = response.status_code
+        return response
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    except RequestValidationError:
+        status = 422
+        raise
+    except (Overloaded, DeadlineExceeded, ClientDisconnected) as e:
+        status = SHED_STATUS[type(e)]
+        raise
+    finally:
+        # Arbitrary names from the URL must not create new label series
+        label = model_name if model_name in registry.names() else "unknown"
+        elapsed = time.perf_counter() - start
+        REQUEST_SECONDS.observe(elapsed, (label, endpoint))
+        REQUESTS.inc((label, endpoint, str(status)))
+        if captured:
+            await _capture_request(request, model_name, endpoint, status, started_at, elapsed)
+
+async def _capture_request(request, model_name, endpoint, status, started_at, elapsed):
+    """Queue the request for the capture file, the writer thread encodes it"""
+    try:
+        body = await request.body()
+    except ClientDisconnect:
+        return
+    capture.record({
+        "ts": started_at,
+        "model": model_name,
+        "endpoint": endpoint,
+        "path": request.url.path,
+        "content_type": request.headers.get("content-type"),
+        "accept": request.headers.get("accept"),
+        "layout": request.headers.get("x-feature-layout"),
+        "status": status,
+        "latency_ms": elapsed * 1000,
+        "body": body
+    })
+
+def _record_schema():
+    """InputData's JSON schema with the valid range of each feature from the feature schema"""
+    schema = InputData.model_json_schema()
+    for name, field in schema["properties"].items():
+        field.update(FEATURE_SCHEMA.describe(name))
+    return schema
+
+BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "records": {"type": "array", "items": _record_schema()},
+        "columns": {
+            "type": "object",
+            "properties": {name: {"type": "array", "items": {"type": "number", **FEATURE_SCHEMA.describe(name)}} for name in FEATURE_SCHEMA.names}
+        }
+    },
+    "description": "Either records, one object per row, or columns, one array per feature"
+}
+
+SINGLE_REQUEST_BODY = _request_body(_record_schema())
+BATCH_REQUEST_BODY = _request_body(BATCH_SCHEMA)
+EXPLAIN_REQUEST_BODY = _request_body({"oneOf": [_record_schema(), BATCH_SCHEMA]})
+
 @app.get("/")
 def read_root():
     return {"message": "ML Prediction API is running"}
 
 @app.get("/health")
 def health_check():
+    # Liveness: answers as long as the process is serving, loaded or not
+    entry = registry.get(DEFAULT_MODEL)
     return {
         "status": "healthy",
-        "model_loaded": session is not None,
-        "model_type": "mock" if isinstance(session, MockModel) else "onnx"
+        "ready": ready.is_set(),
+        "model_loaded": entry is not None,
+        "model_type": entry.kind if entry is not None else None,
+        "default_model": DEFAULT_MODEL,
+        "models": registry.status(),
+        "cache": {name: cache.stats() for name, cache in caches.items()} if caches else {"enabled": False},
+        "executor": inference_executor.stats()
     }
 
-@app.post("/predict")
-def predict(data: InputData):
-    try:
-        # Prepare input data for the model
-        input_data = {
-            'rainfall': np.array([[data.rainfall]], dtype=np.float32),
-            'temperature': np.array([[data.temperature]], dtype=np.float32),
-            'humidity': np.array([[data.humidity]], dtype=np.float32),
-            'soil_ph': np.array([[data.soil_ph]], dtype=np.float32),
-            'fertilizer_usage': np.array([[data.fertilizer_usage]], dtype=np.float32),
-            'risk_score': np.array([[data.risk_score]], dtype=np.float32)
+@app.get("/ready")
+def readiness_check():
+    # Readiness: 503 until the default model is loaded and warmed, so no traffic is routed too early
+    is_ready = ready.is_set() and registry.get(DEFAULT_MODEL) is not None
+    return JSONResponse(
+        {"ready": is_ready, "models": {name: registry.get(name) is not None for name in registry.names()}, "startup": startup_report.to_dict()},
+        status_code=200 if is_ready else 503
+    )
+
+@app.get("/batching/stats")
+def batching_stats():
+    if not batchers:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "max_batch_size": MICRO_BATCH_MAX_SIZE,
+        "max_wait_ms": MICRO_BATCH_MAX_WAIT_MS,
+        "models": {
+            name: {"queue_depth": batcher.queue_depth(), **batcher.stats.to_dict()}
+            for name, batcher in batchers.items()
         }
-        
-        # Run inference
-        output_name = session.get_outputs()[0].name
-        result = session.run([output_name], input_data)
-        
-        # Convert result to float32
-        prediction = result[0].astype(np.float32).tolist()
-        return {"prediction": prediction}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Prediction error: {str(e)}")
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+def list_models():
+    return {"default_model": DEFAULT_MODEL, "models": registry.status()}
+
+@app.post("/admin/models/{model_name}/reload", status_code=202, dependencies=[Depends(require_admin)])
+def reload_model(model_name: str, engine: str = None):
+    # The new version is built and warmed in the background, then swapped in
+    try:
+        if engine is not None:
+            registry.set_engine(model_name, engine)
+        registry.reload(model_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{model_name}'")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"model": model_name, "status": "reloading", "engine": engine}
+
+def _stop_onnx_profile(model_name):
+    timer = onnx_profile_timers.pop(model_name, None)
+    if timer is not None:
+        timer.cancel()
+    path = registry.stop_profiling(model_name)
+    print(f"ONNX Runtime profile of '{model_name}' written to {path}")
+    return path
+
+def _stop_onnx_profile_on_timeout(model_name):
+    try:
+        _stop_onnx_profile(model_name)
+    except RuntimeError:
+        # Already stopped through the endpoint
+        pass
+
+# Profiles swap live sessions and write files, so these routes only exist when ADMIN_TOKEN is set
+profile_router = APIRouter(prefix="/admin/profile", dependencies=[Depends(require_admin)])
+
+@profile_router.get("")
+def profile_status():
+    files = sorted(os.listdir(PROFILE_DIR)) if os.path.isdir(PROFILE_DIR) else []
+    return {
+        "directory": os.path.abspath(PROFILE_DIR),
+        "python": {"running": python_profiler.running, "last_path": python_profiler.last_path},
+        "onnx": {name: status["profiling"] for name, status in registry.status().items()},
+        "files": files
+    }
+
+@profile_router.post("/python/start", status_code=202)
+def start_python_profile(seconds: float = 10.0):
+    # Samples every thread's stack, including the event loop, so parsing and serialization show up too
+    seconds = _positive_duration(seconds, "seconds")
+    try:
+        seconds = python_profiler.start(seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "profiling", "seconds": seconds}
+
+@profile_router.post("/python/stop")
+def stop_python_profile():
+    try:
+        path = python_profiler.stop()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "stopped", "path": path}
+
+@profile_router.post("/onnx/{model_name}/start", status_code=202)
+def start_onnx_profile(model_name: str, seconds: float = 10.0):
+    # onnxruntime only profiles sessions created with profiling on, so a profiled version is swapped in
+    seconds = min(_positive_duration(seconds, "seconds"), PROFILE_MAX_SECONDS)
+    try:
+        loaded = registry.start_profiling(model_name, profile_path(PROFILE_DIR, f"onnx-{model_name}"))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{model_name}'")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not loaded:
+        raise HTTPException(status_code=503, detail=registry.status()[model_name]["error"])
+    timer = threading.Timer(seconds, _stop_onnx_profile_on_timeout, args=(model_name,))
+    timer.daemon = True
+    onnx_profile_timers[model_name] = timer
+    timer.start()
+    return {"model": model_name, "status": "profiling", "seconds": seconds}
+
+@profile_router.post("/onnx/{model_name}/stop")
+def stop_onnx_profile(model_name: str):
+    try:
+        path = _stop_onnx_profile(model_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{model_name}'")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"model": model_name, "status": "stopped", "path": path}
+
+if ADMIN_TOKEN:
+    app.include_router(profile_router)
+
+@app.post("/predict", openapi_extra=SINGLE_REQUEST_BODY)
+async def predict(request: Request):
+    return await _observe(_predict_one, request, DEFAULT_MODEL, "single")
+
+@app.post("/predict/batch", openapi_extra=BATCH_REQUEST_BODY)
+async def predict_batch(request: Request):
+    return await _observe(_predict_many, request, DEFAULT_MODEL, "batch")
+
+@app.post("/predict/stream", response_class=DuplexStreamingResponse)
+async def predict_stream(request: Request):
+    return await _stream_ndjson(request, DEFAULT_MODEL)
+
+@app.websocket("/predict/stream")
+async def predict_stream_websocket(websocket: WebSocket):
+    await _stream_websocket(websocket, DEFAULT_MODEL)
+
+@app.post("/predict/explain", openapi_extra=EXPLAIN_REQUEST_BODY)
+async def predict_explain(request: Request):
+    return await _observe(_predict_explain, request, DEFAULT_MODEL, "explain")
+
+@app.post("/predict/{model_name}", openapi_extra=SINGLE_REQUEST_BODY)
+async def predict_model(model_name: str, request: Request):
+    return await _observe(_predict_one, request, model_name, "single")
+
+@app.post("/predict/{model_name}/batch", openapi_extra=BATCH_REQUEST_BODY)
+async def predict_model_batch(model_name: str, request: Request):
+    return await _observe(_predict_many, request, model_name, "batch")
+
+@app.post("/predict/{model_name}/explain", openapi_extra=EXPLAIN_REQUEST_BODY)
+async def predict_model_explain(model_name: str, request: Request):
+    return await _observe(_predict_explain, request, model_name, "explain")
+
+@app.post("/predict/{model_name}/stream", response_class=DuplexStreamingResponse)
+async def predict_model_stream(model_name: str, request: Request):
+    return await _stream_ndjson(request, model_name)
+
+@app.websocket("/predict/{model_name}/stream")
+async def predict_model_stream_websocket(websocket: WebSocket, model_name: str):
+    await _stream_websocket(websocket, model_name)
+
+startup_report.record("import app", time.perf_counter() - startup_report.started_at)
@@ -0,0 +1,156 @@
+import asyncio
+import time
+import numpy as np
+
+
+class BatchStats:
+    """Per-flush counters for the micro-batcher"""
+
+    def __init__(self, max_batch_size):
+        # Power-of-two upper bounds for the batch size histogram
+        self.bucket_bounds = []
+        bound = 1
+        while bound < max_batch_size:
+            self.bucket_bounds.append(bound)
+            bound *= 2
+        self.bucket_bounds.append(max_batch_size)
+        self.bucket_counts = [0] * len(self.bucket_bounds)
+        self.flushes = 0
+        self.flushes_full = 0
+        self.rows = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def record(self, batch_size, queue_waits, full):
+        self.flushes += 1
+        self.rows += batch_size
+        if full:
+            self.flushes_full += 1
+        for i, bound in enumerate(self.bucket_bounds):
+            if batch_size <= bound:
+                self.bucket_counts[i] += 1
+                break
+        wait_total = sum(queue_waits)
+        self.queue_wait_total += wait_total
+        self.queue_wait_max = max(self.queue_wait_max, max(queue_waits))
+
+    def to_dict(self):
+        return {
+            "flushes": self.flushes,
+            "flushes_full": self.flushes_full,
+            "flushes_timeout": self.flushes - self.flushes_full,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.flushes if self.flushes else 0.0,
+            "batch_size_histogram": {f"le_{bound}": count for bound, count in zip(self.bucket_bounds, self.bucket_counts)},
+            "queue_wait_ms_mean": 1000 * self.queue_wait_total / self.rows if self.rows else 0.0,
+            "queue_wait_ms_max": 1000 * self.queue_wait_max
+        }
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one batched model call"""
+
+    def __init__(self, run_fn, max_batch_size=64, max_wait_ms=2.0, on_flush=None, executor=None):
+        # run_fn takes a [6, N] float32 array and returns an [N, ...] result
+        self.run_fn = run_fn
+        # InferenceExecutor to run batches on, the loop's default pool if None
+        self.executor = executor
+        # Optional on_flush(batch_size, queue_waits) hook for external metrics
+        self.on_flush = on_flush
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = BatchStats(max_batch_size)
+        self._queue = None
+        self._task = None
+        self._loop = None
+        # Flushes still running, each batch is scored on its own so they overlap on the executor
+        self._flushes = set()
+
+    def _ensure_started(self):
+        # Start lazily on the running loop so the worker is bound to the server's loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._worker())
+
+    async def submit(self, row):
+        """Queue one [6] feature row and wait for its prediction"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((row, future, time.perf_counter()))
+        return await future
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for flush in list(self._flushes):
+            flush.cancel()
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            # Fill the batch until it is full or the wait window closes, waking for each new row
+            while len(items) < self.max_batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # The next batch starts filling while this one is scored
+            flush = loop.create_task(self._flush(loop, items))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, loop, items):
+        # Drop requests whose caller has already gone away or timed out
+        items = [item for item in items if not item[1].done()]
+        if not items:
+            return
+
+        flush_start = time.perf_counter()
+        queue_waits = [flush_start - enqueued for _, _, enqueued in items]
+        self.stats.record(len(items), queue_waits, len(items) >= self.max_batch_size)
+        if self.on_flush is not None:
+            self.on_flush(len(items), queue_waits)
+
+        columns = np.stack([row for row, _, _ in items], axis=1)
+        try:
+            if self.executor is not None:
+                result = await self.executor.run(self.run_fn, columns)
+            else:
+                result = await loop.run_in_executor(None, self.run_fn, columns)
+        except asyncio.CancelledError:
+            # Stopped with the batch still running, its callers are not left waiting
+            for _, future, _ in items:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Scatter each row of the batched output back to its caller
+        for i, (_, future, _) in enumerate(items):
+            if not future.done():
+                future.set_result(result[i:i + 1])
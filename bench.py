@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+from inference import FEATURE_NAMES
+
+EXAMPLE_RECORD = {
+    "rainfall": 100.0,
+    "temperature": 25.0,
+    "humidity": 70.0,
+    "soil_ph": 6.5,
+    "fertilizer_usage": 50.0,
+    "risk_score": 0.3
+}
+
+
+def load_payloads(path, limit=100000):
+    """Read field records from a JSONL file, keeping only the six model features"""
+    records = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                records.append({feature: float(record[feature]) for feature in FEATURE_NAMES})
+            except (ValueError, KeyError, TypeError):
+                continue
+            if len(records) >= limit:
+                break
+    return records
+
+
+def synthetic_payloads(count=1000, seed=0):
+    """Random records spread around the example reading"""
+    rng = random.Random(seed)
+    return [
+        {
+            "rainfall": rng.uniform(0, 300),
+            "temperature": rng.uniform(5, 40),
+            "humidity": rng.uniform(20, 100),
+            "soil_ph": rng.uniform(4.5, 8.5),
+            "fertilizer_usage": rng.uniform(0, 200),
+            "risk_score": rng.uniform(0, 1)
+        }
+        for _ in range(count)
+    ]
+
+
+def parse_mix(spec):
+    """Parse 'single:0.9,batch:0.1' into endpoint weights"""
+    mix = {}
+    for part in spec.split(","):
+        endpoint, weight = part.split(":")
+        if endpoint not in ("single", "batch"):
+            raise ValueError(f"Unknown endpoint '{endpoint}' in mix, expected single or batch")
+        mix[endpoint] = float(weight)
+    return mix
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean()),
+        "max": float(values.max())
+    }
+
+
+def _process_cpu_seconds(pid):
+    """User plus system CPU time of another process, read from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def start_server(cwd=None, env=None):
+    """Start uvicorn on a free local port, from this checkout unless cwd names another one"""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd or os.path.dirname(os.path.abspath(__file__)),
+        env=env
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, url, timeout=10.0):
+    """Wait for the server to load and warm its models"""
+    import httpx
+
+    for _ in range(int(timeout / 0.05)):
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+async def run_load(client, payloads, mix, concurrency, requests, duration, batch_size, model, seed):
+    """Drive the API with a fixed number of concurrent clients and record every latency"""
+    rng = random.Random(seed)
+    endpoints = list(mix)
+    weights = [mix[endpoint] for endpoint in endpoints]
+    prefix = f"/predict/{model}" if model else "/predict"
+    paths = {"single": prefix, "batch": f"{prefix}/batch"}
+
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = {endpoint: 0 for endpoint in endpoints}
+    rows = 0
+    sent = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_request():
+        nonlocal sent
+        if deadline is not None:
+            if time.perf_counter() >= deadline:
+                return None
+        elif sent >= requests:
+            return None
+        sent += 1
+        endpoint = rng.choices(endpoints, weights)[0]
+        if endpoint == "batch":
+            start = rng.randrange(len(payloads))
+            records = [payloads[(start + i) % len(payloads)] for i in range(batch_size)]
+            return endpoint, {"records": records}
+        return endpoint, payloads[rng.randrange(len(payloads))]
+
+    async def worker():
+        nonlocal rows
+        while True:
+            item = next_request()
+            if item is None:
+                return
+            endpoint, body = item
+            start = time.perf_counter()
+            try:
+                response = await client.post(paths[endpoint], json=body)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                latencies[endpoint].append(elapsed)
+                rows += batch_size if endpoint == "batch" else 1
+            else:
+                errors[endpoint] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors, rows, time.perf_counter() - start
+
+
+async def bench_asgi(args, payloads, mix):
+    """Benchmark the app in-process through httpx's ASGI transport"""
+    import httpx
+    from app import app
+
+    # The transport does not send lifespan events, so run startup and shutdown here
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run_load(client, payloads, mix, args.concurrency, args.warmup, None, args.batch_size, args.model, args.seed + 1)
+        # Client and server share this process, so CPU time covers both sides
+        cpu_start = time.process_time()
+        result = await run_load(client, payloads, mix, args.concurrency, args.requests, args.duration, args.batch_size, args.model, args.seed)
+        cpu_seconds = time.process_time() - cpu_start
+    return result, cpu_seconds
+
+
+async def bench_socket(args, payloads, mix):
+    """Benchmark a uvicorn server over a local socket"""
+    import httpx
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server()
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+            await wait_ready(client, url)
+            await run_load(client, payloads, mix, args.concurrency, args.warmup, None, args.batch_size, args.model, args.seed + 1)
+            cpu_start = _process_cpu_seconds(server.pid) if server else None
+            result = await run_load(client, payloads, mix, args.concurrency, args.requests, args.duration, args.batch_size, args.model, args.seed)
+            cpu_end = _process_cpu_seconds(server.pid) if server else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    cpu_seconds = cpu_end - cpu_start if cpu_start is not None and cpu_end is not None else None
+    return result, cpu_seconds
+
+
+def summarize(args, mix, result, cpu_seconds):
+    latencies, errors, rows, elapsed = result
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    completed = len(all_latencies)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": _git_commit(),
+        "config": {
+            "target": args.target,
+            "url": args.url,
+            "model": args.model,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "mix": mix,
+            "batch_size": args.batch_size,
+            "payloads": args.payloads,
+            "env": {key: value for key, value in os.environ.items() if key.startswith(("ORT_", "MICRO_BATCH", "PREDICTION_CACHE"))}
+        },
+        "results": {
+            "requests": completed,
+            "errors": sum(errors.values()),
+            "seconds": elapsed,
+            "requests_per_sec": completed / elapsed if elapsed else 0.0,
+            "rows_per_sec": rows / elapsed if elapsed else 0.0,
+            "cpu_ms_per_request": 1000 * cpu_seconds / completed if cpu_seconds is not None and completed else None,
+            "latency_ms": percentiles(all_latencies),
+            "endpoints": {
+                endpoint: {"requests": len(values), "errors": errors[endpoint], "latency_ms": percentiles(values)}
+                for endpoint, values in latencies.items()
+            }
+        }
+    }
+
+
+def print_report(report):
+    results = report["results"]
+    latency = results["latency_ms"]
+    print(f"Requests: {results['requests']} ({results['errors']} errors) in {results['seconds']:.2f}s")
+    print(f"Throughput: {results['requests_per_sec']:.1f} req/s, {results['rows_per_sec']:.1f} rows/s")
+    if latency:
+        print(f"Latency ms: p50 {latency['p50']:.2f}  p95 {latency['p95']:.2f}  p99 {latency['p99']:.2f}  max {latency['max']:.2f}")
+    if results["cpu_ms_per_request"] is not None:
+        print(f"CPU per request: {results['cpu_ms_per_request']:.3f} ms")
+    for endpoint, stats in results["endpoints"].items():
+        if stats["latency_ms"]:
+            print(f"  {endpoint}: {stats['requests']} requests, p50 {stats['latency_ms']['p50']:.2f} ms, p99 {stats['latency_ms']['p99']:.2f} ms")
+
+
+def compare(base_path, new_path):
+    """Print the change in headline numbers between two saved runs"""
+    with open(base_path) as f:
+        base = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    rows = [
+        ("requests/sec", base["requests_per_sec"], new["requests_per_sec"]),
+        ("rows/sec", base["rows_per_sec"], new["rows_per_sec"]),
+        ("p50 ms", base["latency_ms"].get("p50"), new["latency_ms"].get("p50")),
+        ("p95 ms", base["latency_ms"].get("p95"), new["latency_ms"].get("p95")),
+        ("p99 ms", base["latency_ms"].get("p99"), new["latency_ms"].get("p99")),
+        ("cpu ms/request", base["cpu_ms_per_request"], new["cpu_ms_per_request"]),
+        ("errors", base["errors"], new["errors"])
+    ]
+    print(f"{'metric':<16}{'base':>12}{'new':>12}{'change':>10}")
+    for name, old, current in rows:
+        if old is None or current is None:
+            print(f"{name:<16}{'-':>12}{'-':>12}{'':>10}")
+            continue
+        change = f"{100 * (current - old) / old:+.1f}%" if old else ""
+        print(f"{name:<16}{old:>12.3f}{current:>12.3f}{change:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test and benchmark the prediction API")
+    parser.add_argument("--target", choices=["asgi", "socket"], default="asgi", help="In-process ASGI app or a uvicorn server over a socket")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one (socket target)")
+    parser.add_argument("--model", help="Model name to target via /predict/{model} (default: the default model)")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("-n", "--requests", type=int, default=2000, help="Requests to send")
+    parser.add_argument("-d", "--duration", type=float, help="Run for this many seconds instead of a request count")
+    parser.add_argument("--warmup", type=int, default=100, help="Requests sent before measuring")
+    parser.add_argument("--mix", default="single:1", help="Endpoint weights, e.g. single:0.9,batch:0.1")
+    parser.add_argument("--batch-size", type=int, default=100, help="Records per batch request")
+    parser.add_argument("--payloads", help="JSONL file of field records to draw payloads from (default: synthetic)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Save the results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two saved result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    payloads = load_payloads(args.payloads) if args.payloads else synthetic_payloads(seed=args.seed)
+    if not payloads:
+        print(f"Error: no usable records in {args.payloads}")
+        return 1
+    mix = parse_mix(args.mix)
+
+    print(f"=== Benchmarking {args.target} target, concurrency {args.concurrency}, mix {args.mix} ===")
+    if args.target == "asgi":
+        result, cpu_seconds = asyncio.run(bench_asgi(args, payloads, mix))
+    else:
+        result, cpu_seconds = asyncio.run(bench_socket(args, payloads, mix))
+
+    report = summarize(args, mix, result, cpu_seconds)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
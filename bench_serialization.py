@@ -0,0 +1,113 @@
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from responses import FORMAT_COMPACT, FORMAT_NESTED, prediction_response, predictions_response
+
+DEFAULT_BATCH_SIZES = (1, 100, 10000)
+
+
+def _fastapi_default(result):
+    # What a handler returning a dict goes through: jsonable_encoder, then json.dumps
+    if len(result) == 1:
+        return JSONResponse(jsonable_encoder({"prediction": result.tolist()}))
+    predictions = result.reshape(-1).tolist()
+    return JSONResponse(jsonable_encoder({"predictions": predictions, "count": len(predictions)}))
+
+
+def _json_response(result):
+    # The handlers before the orjson path: tolist() and JSONResponse, without the generic encoder
+    if len(result) == 1:
+        return JSONResponse({"prediction": result.tolist()})
+    predictions = result.reshape(-1).tolist()
+    return JSONResponse({"predictions": predictions, "count": len(predictions)})
+
+
+def _orjson(result):
+    if len(result) == 1:
+        return prediction_response(result, FORMAT_NESTED)
+    return predictions_response(result)
+
+
+def _orjson_compact(result):
+    if len(result) == 1:
+        return prediction_response(result, FORMAT_COMPACT)
+    return predictions_response(result)
+
+
+ENCODERS = {
+    "fastapi default": _fastapi_default,
+    "JSONResponse": _json_response,
+    "orjson": _orjson,
+    "orjson compact": _orjson_compact
+}
+
+
+def time_encoder(encode, result, min_seconds=0.2):
+    """Median microseconds to build the response, including rendering the body"""
+    encode(result)
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while time.perf_counter() < deadline or len(samples) < 5:
+        start = time.perf_counter()
+        encode(result)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples) * 1e6)
+
+
+def benchmark(batch_sizes=DEFAULT_BATCH_SIZES, min_seconds=0.2):
+    rng = np.random.default_rng(0)
+    report = {}
+    for batch_size in batch_sizes:
+        # Model output as the handlers see it, [N, 1] float32
+        result = rng.random((batch_size, 1), dtype=np.float32)
+        # Every encoder must produce the same predictions
+        reference = np.asarray(json.loads(_json_response(result).body)["predictions" if batch_size > 1 else "prediction"], dtype=np.float32)
+        report[batch_size] = {}
+        for name, encode in ENCODERS.items():
+            body = encode(result).body
+            decoded = json.loads(body)
+            values = np.asarray(decoded["predictions" if batch_size > 1 else "prediction"], dtype=np.float32).reshape(reference.shape)
+            report[batch_size][name] = {
+                "us": time_encoder(encode, result, min_seconds),
+                "bytes": len(body),
+                "matches": bool(np.array_equal(values, reference))
+            }
+    return report
+
+
+def print_report(report):
+    print(f"{'rows':>6} {'encoder':<16} {'time':>12} {'bytes':>10} {'speedup':>8}")
+    for batch_size, results in report.items():
+        baseline = results["JSONResponse"]["us"]
+        for name, result in results.items():
+            marker = "✓" if result["matches"] else "✗"
+            print(f"{batch_size:>6} {name:<16} {result['us']:>10.1f}us {result['bytes']:>10} {baseline / result['us']:>7.2f}x {marker}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the cost of encoding prediction responses")
+    parser.add_argument("--batch-sizes", default=",".join(str(size) for size in DEFAULT_BATCH_SIZES), help="Comma-separated rows per response")
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Time spent measuring each encoder at each size")
+    parser.add_argument("-o", "--output", help="Save the results as JSON")
+    args = parser.parse_args(argv)
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size.strip()]
+    print("=== Benchmarking response serialization ===")
+    report = benchmark(batch_sizes, args.min_seconds)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results saved to {args.output}")
+    if not all(result["matches"] for results in report.values() for result in results.values()):
+        print("✗ Some encoders returned different predictions")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
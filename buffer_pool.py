@@ -0,0 +1,82 @@
+import threading
+import numpy as np
+from inference import FEATURE_NAMES, run_batch
+
+# Row counts up to this get their own pre-bound buffers on each thread
+DEFAULT_MAX_ROWS = 64
+
+
+class _Binding:
+    """Input and output buffers for one row count, bound to the session once"""
+
+    def __init__(self, session, n_rows, single_input, output_name, output_width):
+        self.binding = session.io_binding()
+        if single_input:
+            # One [N, 6] input, rows written transposed from the feature-major columns
+            self.inputs = np.empty((n_rows, len(FEATURE_NAMES)), dtype=np.float32)
+            self.binding.bind_input(session.get_inputs()[0].name, "cpu", 0, np.float32, [n_rows, len(FEATURE_NAMES)], self.inputs.ctypes.data)
+        else:
+            # Each feature row of a [6, N] buffer is a contiguous [N, 1] input
+            self.inputs = np.empty((len(FEATURE_NAMES), n_rows), dtype=np.float32)
+            for i, feature in enumerate(FEATURE_NAMES):
+                self.binding.bind_input(feature, "cpu", 0, np.float32, [n_rows, 1], self.inputs[i].ctypes.data)
+        self.single_input = single_input
+        self.outputs = np.empty((n_rows, output_width), dtype=np.float32)
+        self.binding.bind_output(output_name, "cpu", 0, np.float32, [n_rows, output_width], self.outputs.ctypes.data)
+
+    def run(self, session, columns):
+        if self.single_input:
+            self.inputs[...] = np.asarray(columns).T
+        else:
+            self.inputs[...] = columns
+        session.run_with_iobinding(self.binding)
+        # The buffer is reused by the next call on this thread, so hand out a copy
+        return self.outputs.copy()
+
+
+class BoundSession:
+    """ONNX Runtime session that runs small batches through per-thread, pre-bound float32 buffers"""
+
+    def __init__(self, session, max_rows=DEFAULT_MAX_ROWS):
+        self.session = session
+        self.max_rows = max_rows
+        inputs = session.get_inputs()
+        self.single_input = len(inputs) == 1
+        output = session.get_outputs()[0]
+        self.output_name = output.name
+        self.output_width = output.shape[1]
+        self._local = threading.local()
+
+    @staticmethod
+    def supports(session):
+        """True when every input and the first output are float32 tensors with a fixed output width"""
+        inputs = session.get_inputs()
+        output = session.get_outputs()[0]
+        if len(inputs) == 1:
+            if list(inputs[0].shape[1:]) != [len(FEATURE_NAMES)]:
+                return False
+        elif sorted(value.name for value in inputs) != sorted(FEATURE_NAMES):
+            return False
+        return (
+            all(value.type == "tensor(float)" for value in inputs)
+            and output.type == "tensor(float)"
+            and len(output.shape) == 2
+            and isinstance(output.shape[1], int)
+        )
+
+    def predict_columns(self, columns):
+        n_rows = len(columns[0])
+        if n_rows > self.max_rows:
+            # Large batches are dominated by compute, the plain path avoids keeping big buffers around
+            return run_batch(self.session, columns)
+        bindings = getattr(self._local, "bindings", None)
+        if bindings is None:
+            bindings = self._local.bindings = {}
+        binding = bindings.get(n_rows)
+        if binding is None:
+            binding = bindings[n_rows] = _Binding(self.session, n_rows, self.single_input, self.output_name, self.output_width)
+        return binding.run(self.session, columns)
+
+    # Everything else is the wrapped session
+    def __getattr__(self, name):
+        return getattr(self.session, name)
@@ -0,0 +1,215 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from inference import DEFAULT_MODEL_PATH, FEATURE_NAMES, load_session, run_batch
+from fast_path import ENGINES, select_engine
+from feature_schema import FeatureSchema
+
+# Session and feature schema loaded once per worker process by _init_worker
+_session = None
+_schema = None
+
+
+def _init_worker(model_path, engine="auto"):
+    global _session, _schema
+    _schema = FeatureSchema.load()
+    _session = load_session(model_path)
+    if _session is None:
+        raise RuntimeError(f"Could not load model from {model_path}")
+    _session, _ = select_engine(_session, model_path, engine)
+
+
+def detect_format(path, explicit=None):
+    """Pick jsonl or csv from an explicit choice or the file extension"""
+    if explicit:
+        return explicit
+    if path.endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+def read_chunks(path, file_format, chunk_size):
+    """Yield (header, rows) chunks from a JSONL or CSV file without loading it all"""
+    with open(path, newline="") as f:
+        if file_format == "csv":
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            chunk = []
+            for row in reader:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield header, chunk
+                    chunk = []
+            if chunk:
+                yield header, chunk
+        else:
+            chunk = []
+            for line in f:
+                if line.strip():
+                    chunk.append(line)
+                    if len(chunk) >= chunk_size:
+                        yield None, chunk
+                        chunk = []
+            if chunk:
+                yield None, chunk
+
+
+def _parse_jsonl(lines):
+    """Parse JSONL lines into records and the feature values of the rows that are valid"""
+    records = []
+    values = []
+    errors = {}
+    for i, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+            values.append([float(record[feature]) for feature in FEATURE_NAMES])
+            records.append(record)
+        except Exception as e:
+            records.append(None)
+            errors[i] = f"{type(e).__name__}: {e}"
+    return records, values, errors
+
+
+def _parse_csv(header, rows):
+    """Parse CSV rows into the feature values of the rows that are valid"""
+    missing = [feature for feature in FEATURE_NAMES if feature not in header]
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+    indices = [header.index(feature) for feature in FEATURE_NAMES]
+    values = []
+    errors = {}
+    for i, row in enumerate(rows):
+        try:
+            values.append([float(row[j]) for j in indices])
+        except Exception as e:
+            errors[i] = f"{type(e).__name__}: {e}"
+    return values, errors
+
+
+def score_chunk(header, rows, file_format):
+    """Score one chunk in the worker and return (formatted output text, rows scored, rows failed)"""
+    if file_format == "csv":
+        values, errors = _parse_csv(header, rows)
+    else:
+        records, values, errors = _parse_jsonl(rows)
+
+    # Vectorized inference over every valid row in the chunk
+    predictions = []
+    if values:
+        columns = np.ascontiguousarray(np.array(values, dtype=np.float32).T)
+        # Rows outside the feature schema's ranges fail like unparseable ones, with every failing feature named
+        bad_values, feature_indices = _schema.check(columns)
+        if len(bad_values):
+            row_indices = [i for i in range(len(rows)) if i not in errors]
+            reasons = {}
+            for value_index, feature_index in zip(bad_values.tolist(), feature_indices.tolist()):
+                value = float(columns[feature_index, value_index])
+                _, message = _schema.value_error(feature_index, value)
+                reasons.setdefault(row_indices[value_index], []).append(f"{FEATURE_NAMES[feature_index]}={value:g}: {message}")
+            for row_index, messages in reasons.items():
+                errors[row_index] = "; ".join(messages)
+            columns = np.ascontiguousarray(np.delete(columns, np.unique(bad_values), axis=1))
+        if columns.shape[1]:
+            predictions = run_batch(_session, columns).reshape(-1).tolist()
+
+    out = io.StringIO()
+    scored = iter(predictions)
+    if file_format == "csv":
+        writer = csv.writer(out)
+        for i, row in enumerate(rows):
+            # Failed rows keep an empty prediction and say why in the error column
+            writer.writerow(row + (["", errors[i]] if i in errors else [next(scored), ""]))
+    else:
+        for i, record in enumerate(records):
+            if i in errors:
+                out.write(json.dumps({"line": rows[i].rstrip("\n"), "prediction": None, "error": errors[i]}) + "\n")
+            else:
+                record["prediction"] = next(scored)
+                out.write(json.dumps(record) + "\n")
+    return out.getvalue(), len(predictions), len(errors)
+
+
+def bulk_score(input_path, output_path, model_path=DEFAULT_MODEL_PATH, chunk_size=10000, workers=None, file_format=None, engine="auto"):
+    """Stream a file through the model chunk by chunk, writing predictions as they complete"""
+    file_format = detect_format(input_path, file_format)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    start = time.perf_counter()
+    total_scored = 0
+    total_failed = 0
+    header_written = False
+
+    with open(output_path, "w", newline="") as out:
+        def write(header, result):
+            nonlocal header_written, total_scored, total_failed
+            text, scored, failed = result
+            if file_format == "csv" and not header_written:
+                csv.writer(out).writerow(header + ["prediction", "error"])
+                header_written = True
+            out.write(text)
+            total_scored += scored
+            total_failed += failed
+
+        if workers <= 1:
+            _init_worker(model_path, engine)
+            for header, rows in read_chunks(input_path, file_format, chunk_size):
+                write(header, score_chunk(header, rows, file_format))
+        else:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            max_in_flight = workers * 2
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path, engine)) as pool:
+                for header, rows in read_chunks(input_path, file_format, chunk_size):
+                    pending.append((header, pool.submit(score_chunk, header, rows, file_format)))
+                    if len(pending) >= max_in_flight:
+                        header, future = pending.popleft()
+                        write(header, future.result())
+                while pending:
+                    header, future = pending.popleft()
+                    write(header, future.result())
+
+    elapsed = time.perf_counter() - start
+    rows_per_sec = (total_scored + total_failed) / elapsed if elapsed > 0 else 0.0
+    return {
+        "rows_scored": total_scored,
+        "rows_failed": total_failed,
+        "seconds": elapsed,
+        "rows_per_sec": rows_per_sec
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSONL or CSV file of field records in bulk")
+    parser.add_argument("input", help="Input file (.jsonl or .csv)")
+    parser.add_argument("output", help="Output file, written in the same format as the input")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="ONNX model to score with")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from the file extension)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per inference call")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="NumPy fast path when the graph allows it, or always ONNX Runtime")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count, 1 runs in-process)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        print(f"Error: {args.input} not found!")
+        return 1
+
+    print(f"=== Bulk scoring {args.input} ===")
+    report = bulk_score(args.input, args.output, args.model, args.chunk_size, args.workers, args.format, args.engine)
+    print(f"✓ Scored {report['rows_scored']} rows ({report['rows_failed']} failed) in {report['seconds']:.2f}s")
+    print(f"✓ Throughput: {report['rows_per_sec']:.0f} rows/sec")
+    print(f"✓ Predictions written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
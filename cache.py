@@ -0,0 +1,244 @@
+import mmap
+from abc import ABC, abstractmethod
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+from inference import FEATURE_NAMES
+
+
+def parse_quantization(spec):
+    """Parse 'rainfall=0.1,temperature=0.5' into a {feature: step} dict"""
+    quantization = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        feature, step = part.split("=")
+        feature = feature.strip()
+        if feature not in FEATURE_NAMES:
+            raise ValueError(f"Unknown feature '{feature}' in cache quantization")
+        quantization[feature] = float(step)
+    return quantization
+
+
+class CacheBackend(ABC):
+    """Storage interface for cached predictions keyed by fixed-size byte strings"""
+
+    @abstractmethod
+    def get(self, key):
+        """The stored [k] float32 value, or None on a miss"""
+
+    @abstractmethod
+    def set(self, key, value):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def close(self):
+        """Release the storage when the server shuts down"""
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+
+class LRUBackend(CacheBackend):
+    """In-process LRU cache with a per-entry time to live"""
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedMemoryBackend(CacheBackend):
+    """Direct-mapped table in named shared memory, shared by every worker on the host
+
+    Each key hashes to one slot and a newer entry overwrites an older one, so eviction is
+    by collision and TTL rather than strict LRU. Stored values are single float32 predictions.
+    """
+
+    KEY_BYTES = 8 * (len(FEATURE_NAMES) + 1)
+
+    def __init__(self, name="agri_prediction_cache", slots=65536, ttl_seconds=300.0):
+        from multiprocessing import shared_memory
+
+        self.slots = slots
+        self.ttl_seconds = ttl_seconds
+        size = slots * (self.KEY_BYTES + 4 + 8)
+        self._shm = None
+        try:
+            self._shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            pass
+        # Some platforms round the segment up to whole pages
+        if self._shm is not None and self._shm.size not in (size, -(-size // mmap.PAGESIZE) * mmap.PAGESIZE):
+            # Left behind by a server configured with another PREDICTION_CACHE_SIZE, its layout does not fit
+            print(f"Replacing shared cache segment {name}: {self._shm.size} bytes, expected {size}")
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        # Only the process that created the segment removes it on shutdown
+        self.created = self._shm is None
+        if self.created:
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                self._shm.buf[:] = bytes(size)
+            except FileExistsError:
+                # Another worker created it in the meantime
+                self._shm = shared_memory.SharedMemory(name=name)
+                self.created = False
+        buf = self._shm.buf
+        self._keys = np.ndarray((slots, self.KEY_BYTES), dtype=np.uint8, buffer=buf)
+        self._values = np.ndarray((slots,), dtype=np.float32, buffer=buf, offset=slots * self.KEY_BYTES)
+        # Expiry is wall-clock time so every process agrees on it
+        self._expires = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=slots * (self.KEY_BYTES + 4))
+
+    def _slot(self, key):
+        return zlib.crc32(key) % self.slots
+
+    def get(self, key):
+        slot = self._slot(key)
+        expires = self._expires[slot]
+        if expires < time.time() or self._keys[slot].tobytes() != key:
+            return None
+        value = self._values[slot]
+        # Treat a slot rewritten while reading it as a miss
+        if self._expires[slot] != expires:
+            return None
+        return np.array([value], dtype=np.float32)
+
+    def set(self, key, value):
+        slot = self._slot(key)
+        self._expires[slot] = 0.0
+        self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+        self._values[slot] = value[0]
+        self._expires[slot] = time.time() + self.ttl_seconds
+
+    def clear(self):
+        self._expires[:] = 0.0
+
+    def close(self):
+        if self._shm is None:
+            return
+        # The array views hold the buffer, they have to go before the mapping can be closed
+        self._keys = self._values = self._expires = None
+        self._shm.close()
+        if self.created:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                # Already replaced by a server started with another size
+                pass
+        self._shm = None
+
+    def __len__(self):
+        return int(np.count_nonzero(self._expires > time.time()))
+
+
+class PredictionCache:
+    """Result cache in front of the model, keyed on (optionally quantized) feature vectors"""
+
+    def __init__(self, backend, quantization=None):
+        self.backend = backend
+        self.quantization = quantization or {}
+        self._steps = np.array([self.quantization.get(feature, 0.0) for feature in FEATURE_NAMES], dtype=np.float64)
+        self._version = 0
+        self.model_version = None
+        # Updated from the event loop and from inference threads
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, model_version=""):
+        """Drop every entry, called whenever the model behind the cache changes"""
+        self.model_version = model_version
+        self._version = zlib.crc32(str(model_version).encode())
+        self.backend.clear()
+
+    def keys(self, columns):
+        """Build one key per row from six feature columns"""
+        rows = np.stack([np.asarray(column, dtype=np.float64) for column in columns], axis=1)
+        quantized = self._steps > 0
+        if quantized.any():
+            rows[:, quantized] = np.round(rows[:, quantized] / self._steps[quantized])
+        keyed = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.float64)
+        keyed[:, 0] = self._version
+        keyed[:, 1:] = rows
+        return [row.tobytes() for row in keyed]
+
+    def close(self):
+        self.backend.close()
+
+    def lookup(self, keys):
+        """Return cached values per key (None on a miss) and the indices that missed"""
+        values = [self.backend.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        with self._counter_lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return values, missing
+
+    def store(self, keys, results):
+        for key, result in zip(keys, results):
+            # Copy so a cached row does not keep the whole batch output alive
+            self.backend.set(key, np.array(result, dtype=np.float32))
+
+    def stats(self):
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "enabled": True,
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0
+        }
+
+
+def predict_cached(cache, columns, run_fn):
+    """Serve rows from the cache and score only the misses in one call"""
+    keys = cache.keys(columns)
+    values, missing = cache.lookup(keys)
+    if missing:
+        if len(missing) == len(keys):
+            miss_columns = columns
+        else:
+            miss_columns = np.stack([np.asarray(column)[missing] for column in columns])
+        results = run_fn(miss_columns)
+        cache.store([keys[i] for i in missing], results)
+        for i, result in zip(missing, results):
+            values[i] = result
+    return np.stack(values)
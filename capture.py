@@ -0,0 +1,108 @@
+import base64
+import json
+import os
+import queue
+import random
+import threading
+
+# Stops the writer thread
+_STOP = object()
+
+
+class TrafficCapture:
+    """Append sampled prediction requests to a rotating JSONL file from a background thread
+
+    The request path only takes a sampling decision and a non-blocking queue put. Encoding and
+    file I/O happen on the writer thread, and entries are dropped rather than waited for when
+    the writer falls behind.
+    """
+
+    def __init__(self, path, sample_rate=0.1, max_bytes=100 * 1024 * 1024, backups=5, queue_size=10000):
+        # {pid} in the path gives each worker process its own file
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._file = None
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+    def sample(self):
+        """Whether to capture the next request"""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, entry):
+        """Queue an entry for writing, the body may still be raw bytes"""
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self._thread is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=5.0):
+        """Write out what is queued and stop the writer"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+            "rotations": self.rotations
+        }
+
+    @staticmethod
+    def encode(entry):
+        """One JSONL line, with JSON bodies kept as text and binary bodies as base64"""
+        body = entry.pop("body", b"")
+        try:
+            entry["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["body"] = base64.b64encode(body).decode("ascii")
+            entry["body_encoding"] = "base64"
+        return json.dumps(entry, separators=(",", ":")) + "\n"
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a")
+        self.rotations += 1
+
+    def _write_loop(self):
+        self._file = open(self.path, "a")
+        try:
+            while True:
+                entry = self._queue.get()
+                if entry is _STOP:
+                    break
+                line = self.encode(entry)
+                if self.max_bytes and self._file.tell() + len(line) > self.max_bytes and self._file.tell() > 0:
+                    self._rotate()
+                self._file.write(line)
+                self.written += 1
+                # Flush whenever the queue runs dry so the file is readable while capturing
+                if self._queue.empty():
+                    self._file.flush()
+        finally:
+            self._file.close()
@@ -0,0 +1,128 @@
+import numpy as np
+from inference import FEATURE_NAMES
+
+# Content types accepted and produced alongside JSON
+FLOAT32_CONTENT_TYPE = "application/octet-stream"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+# Layouts for packed float32 buffers
+LAYOUT_COLUMNS = "columns"  # [6, N] feature-major, maps straight onto the model inputs
+LAYOUT_ROWS = "rows"  # [N, 6] row-major, one record after another
+
+BYTES_PER_ROW = 4 * len(FEATURE_NAMES)
+
+
+class ColumnarFormatError(ValueError):
+    """Raised when a binary request body cannot be decoded"""
+
+
+def media_type(header_value):
+    """Strip parameters from a Content-Type or Accept header value"""
+    return (header_value or "").split(";")[0].strip().lower()
+
+
+def is_binary(content_type):
+    return media_type(content_type) in (FLOAT32_CONTENT_TYPE, ARROW_CONTENT_TYPE)
+
+
+def decode_float32(body, layout=LAYOUT_COLUMNS):
+    """Map a packed little-endian float32 buffer onto six feature columns without copying"""
+    if not body or len(body) % BYTES_PER_ROW != 0:
+        raise ColumnarFormatError(f"Body must be a non-empty multiple of {BYTES_PER_ROW} bytes (6 float32 features per row)")
+    values = np.frombuffer(body, dtype="<f4")
+    n_rows = len(values) // len(FEATURE_NAMES)
+    if layout == LAYOUT_COLUMNS:
+        return values.reshape(len(FEATURE_NAMES), n_rows)
+    if layout == LAYOUT_ROWS:
+        # Row-major input has to be transposed into contiguous columns once
+        return np.ascontiguousarray(values.reshape(n_rows, len(FEATURE_NAMES)).T)
+    raise ColumnarFormatError(f"Unknown layout '{layout}', expected '{LAYOUT_COLUMNS}' or '{LAYOUT_ROWS}'")
+
+
+def decode_arrow(body):
+    """Read an Arrow IPC stream and return its six feature columns as float32 arrays"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ColumnarFormatError("Arrow input requires the pyarrow package")
+
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except Exception as e:
+        raise ColumnarFormatError(f"Invalid Arrow stream: {e}")
+
+    missing = [feature for feature in FEATURE_NAMES if feature not in table.column_names]
+    if missing:
+        raise ColumnarFormatError(f"Arrow stream is missing columns: {', '.join(missing)}")
+    if table.num_rows == 0:
+        raise ColumnarFormatError("Arrow stream contains no rows")
+
+    columns = []
+    for feature in FEATURE_NAMES:
+        column = table.column(feature)
+        if column.null_count:
+            raise ColumnarFormatError(f"Column '{feature}' contains nulls")
+        if column.type != pa.float32():
+            try:
+                column = column.cast(pa.float32())
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+                raise ColumnarFormatError(f"Column '{feature}' of type {column.type} cannot be read as float32: {e}")
+        # A single float32 chunk is exposed zero-copy, otherwise the chunks are joined once
+        column = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+        columns.append(column.to_numpy(zero_copy_only=False))
+    return columns
+
+
+def decode(content_type, body, layout=LAYOUT_COLUMNS):
+    """Decode a binary request body into six feature columns"""
+    if media_type(content_type) == ARROW_CONTENT_TYPE:
+        return decode_arrow(body)
+    return decode_float32(body, layout)
+
+
+def encode_float32(predictions):
+    """Pack predictions as little-endian float32 bytes"""
+    return np.ascontiguousarray(predictions, dtype="<f4").tobytes()
+
+
+def encode_arrow(predictions):
+    """Write predictions as a single-column Arrow IPC stream"""
+    import pyarrow as pa
+
+    column = pa.array(np.ascontiguousarray(predictions, dtype=np.float32).reshape(-1))
+    batch = pa.record_batch([column], names=["prediction"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def binary_response_type(accept):
+    """Return the binary media type named in an Accept header, or None for JSON
+
+    Raises ColumnarFormatError when only Arrow is accepted and pyarrow is not installed.
+    """
+    accepted = [media_type(value) for value in (accept or "").split(",")]
+    if ARROW_CONTENT_TYPE in accepted:
+        if arrow_available():
+            return ARROW_CONTENT_TYPE
+        if FLOAT32_CONTENT_TYPE not in accepted and not {"application/json", "*/*", "application/*"} & set(accepted):
+            raise ColumnarFormatError("Arrow output requires the pyarrow package")
+    if FLOAT32_CONTENT_TYPE in accepted:
+        return FLOAT32_CONTENT_TYPE
+    return None
+
+
+def encode(response_type, predictions):
+    """Encode predictions as the given binary media type"""
+    if response_type == ARROW_CONTENT_TYPE:
+        return encode_arrow(predictions)
+    return encode_float32(predictions)
@@ -11,17 +11,17 @@ def create_working_agricultural_model():
     input_features = ['rainfall', 'temperature', 'humidity', 'soil_ph', 'fertilizer_usage', 'risk_score']
     output_name = 'yield_prediction'
     
-    # Create input tensors
+    # Create input tensors with a dynamic batch dimension so rows can be scored together
     input_tensors = []
     for feature in input_features:
         input_tensor = helper.make_tensor_value_info(
-            feature, onnx.TensorProto.FLOAT, [1, 1]
+            feature, onnx.TensorProto.FLOAT, ['batch', 1]
         )
         input_tensors.append(input_tensor)
     
     # Create output tensor
     output_tensor = helper.make_tensor_value_info(
-        output_name, onnx.TensorProto.FLOAT, [1, 1]
+        output_name, onnx.TensorProto.FLOAT, ['batch', 1]
     )
     
     # Create nodes for a simple agricultural yield prediction model
@@ -93,6 +93,11 @@ def create_working_agricultural_model():
         result = session.run([output_name], test_input)
         print(f"✓ Test inference successful: {result[0]}")
         
+        # Test batched inference
+        batch_input = {name: np.repeat(value, 4, axis=0) for name, value in test_input.items()}
+        batch_result = session.run([output_name], batch_input)
+        print(f"✓ Batch inference successful: shape {batch_result[0].shape}")
+        
         return True
     except Exception as e:
         print(f"✗ Model test failed: {e}")
@@ -105,5 +110,6 @@ if __name__ == "__main__":
     if success:
         print("\n✅ Success! Working model created and tested.")
         print("You can now use this model in your FastAPI app.")
+        print("Run `python optimize_model.py` to build the fused [N, 6] variant the server prefers.")
     else:
         print("\n❌ Failed to create working model")
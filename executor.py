@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full and a request has to be shed"""
+
+    def __init__(self, retry_after):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its deadline"""
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away before its prediction is ready"""
+
+
+class InferenceExecutor:
+    """Dedicated thread pool for model calls, with a bounded number of admitted requests"""
+
+    def __init__(self, max_workers=4, max_pending=1024, retry_after=1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._pool = None
+        # Only touched from the event loop thread, so no lock is needed
+        self.pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.disconnected = 0
+
+    def check(self):
+        """Raise Overloaded if a request would be shed right now, without admitting it"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(self.retry_after)
+
+    @contextmanager
+    def admit(self):
+        """Admit one request into the inference path or raise Overloaded"""
+        self.check()
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        return self._pool
+
+    async def run(self, fn, *args):
+        """Run fn on the inference pool, cancelling the await drops it if it has not started yet"""
+        return await asyncio.wrap_future(self._get_pool().submit(fn, *args))
+
+    def warm(self, fn=None, timeout=10.0):
+        """Start every pool thread up front and run fn once on each, so no request pays for it"""
+        pool = self._get_pool()
+        # Each task holds its thread at the barrier, which forces the pool to start all of them
+        barrier = threading.Barrier(self.max_workers)
+
+        def task():
+            barrier.wait(timeout)
+            if fn is not None:
+                fn()
+
+        for future in [pool.submit(task) for _ in range(self.max_workers)]:
+            future.result()
+
+    async def wait(self, awaitable, timeout=None, request=None):
+        """Await inference with a deadline, dropping the work if the client disconnects first"""
+        work = asyncio.ensure_future(awaitable)
+        watchers = {work}
+        disconnect = None
+        if request is not None:
+            disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+            watchers.add(disconnect)
+
+        try:
+            done, _ = await asyncio.wait(watchers, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if disconnect is not None:
+                disconnect.cancel()
+
+        if work in done:
+            return work.result()
+
+        # Cancelling drops work that is still queued in the batcher or the pool
+        work.cancel()
+        if disconnect is not None and disconnect in done:
+            self.disconnected += 1
+            raise ClientDisconnected()
+        self.timed_out += 1
+        raise DeadlineExceeded("Prediction did not finish before the request deadline")
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "disconnected": self.disconnected
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+async def _wait_for_disconnect(request):
+    # Once the body has been read, the next ASGI message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
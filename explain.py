@@ -0,0 +1,97 @@
+import itertools
+import math
+import numpy as np
+from inference import FEATURE_NAMES, run_batch
+from fast_path import ACTIVATIONS, LinearModel, UnsupportedGraph, check_parity, compile_model
+
+
+def parse_baseline(spec, default):
+    """Parse 'rainfall=100,soil_ph=6.5' over a default [6] row into the reference row contributions are measured from"""
+    baseline = np.array(default, dtype=np.float32)
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        feature, value = part.split("=")
+        feature = feature.strip()
+        if feature not in FEATURE_NAMES:
+            raise ValueError(f"Unknown feature '{feature}' in explanation baseline")
+        baseline[FEATURE_NAMES.index(feature)] = float(value)
+    return baseline
+
+
+def _coalitions(n_features):
+    """Every subset of the features as a [2^n, n] mask, and the matrix turning their values into Shapley values"""
+    masks = np.array(list(itertools.product((0, 1), repeat=n_features)), dtype=bool)[:, ::-1]
+    index = {tuple(mask): i for i, mask in enumerate(masks.tolist())}
+    shapley = np.zeros((n_features, len(masks)))
+    for i, mask in enumerate(masks.tolist()):
+        size = sum(mask)
+        for feature in range(n_features):
+            if mask[feature]:
+                continue
+            # Weight of adding this feature to a coalition of this size, over every order of the features
+            weight = math.factorial(size) * math.factorial(n_features - size - 1) / math.factorial(n_features)
+            with_feature = list(mask)
+            with_feature[feature] = True
+            shapley[feature, index[tuple(with_feature)]] += weight
+            shapley[feature, i] -= weight
+    return masks, shapley
+
+
+# Six features give 64 coalitions, enumerated once
+COALITION_MASKS, SHAPLEY_MATRIX = _coalitions(len(FEATURE_NAMES))
+
+
+class Explainer:
+    """Exact Shapley contributions of each feature to a prediction, relative to a baseline row
+
+    The value of every coalition of features is the prediction with the features outside the
+    coalition set to the baseline. For a linear model those values follow from the weights and
+    bias directly. For any other model every coalition of every row is stacked into one array
+    and scored in a single batched call.
+    """
+
+    def __init__(self, runner, baseline, linear=None):
+        self.runner = runner
+        self.baseline = np.asarray(baseline, dtype=np.float32)
+        # LinearModel with the weights read from the graph initializers, None for other graphs
+        self.linear = linear
+        self.method = "linear" if linear is not None else "shapley"
+
+    @classmethod
+    def for_model(cls, runner, model_path, baseline):
+        """Use the closed form when the graph is affine plus an activation and matches the served runner"""
+        if isinstance(runner, LinearModel):
+            return cls(runner, baseline, runner)
+        if model_path is None:
+            return cls(runner, baseline)
+        import onnx
+
+        try:
+            linear = compile_model(onnx.load(model_path))
+        except (UnsupportedGraph, OSError):
+            return cls(runner, baseline)
+        _, ok = check_parity(linear, runner)
+        return cls(runner, baseline, linear if ok else None)
+
+    def coalition_values(self, columns):
+        """Prediction for every coalition of every row, as [64, N, k]"""
+        n_rows = columns.shape[1]
+        if self.linear is not None:
+            # Each feature adds weight * (value - baseline) to the affine value, no model call needed
+            terms = self.linear.weights.astype(np.float64)[:, :, None] * (columns.astype(np.float64) - self.baseline.reshape(-1, 1))[None, :, :]
+            base = self.linear.weights.astype(np.float64) @ self.baseline.astype(np.float64) + self.linear.bias.reshape(-1)
+            affine = np.einsum("cf,kfn->cnk", COALITION_MASKS.astype(np.float64), terms) + base
+            return ACTIVATIONS[self.linear.activation](affine)
+        # [64, 6, N]: the row's values where the mask is set, the baseline elsewhere
+        stacked = np.where(COALITION_MASKS[:, :, None], columns[None, :, :], self.baseline.reshape(1, -1, 1))
+        flat = np.ascontiguousarray(stacked.transpose(1, 0, 2).reshape(len(FEATURE_NAMES), -1))
+        values = np.asarray(run_batch(self.runner, flat), dtype=np.float64)
+        return values.reshape(len(COALITION_MASKS), n_rows, -1)
+
+    def explain(self, columns):
+        """Predictions [N, k], the baseline prediction [k] and contributions [N, 6, k] that sum to their difference"""
+        columns = np.asarray(columns, dtype=np.float32)
+        values = self.coalition_values(columns)
+        contributions = np.einsum("fc,cnk->nfk", SHAPLEY_MATRIX, values)
+        return values[-1].astype(np.float32), values[0, 0].astype(np.float32), contributions.astype(np.float32)
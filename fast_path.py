@@ -0,0 +1,231 @@
+import numpy as np
+from inference import FEATURE_NAMES, run_batch
+
+# Engines a model can be served with: auto uses numpy when the graph is recognized and passes parity
+ENGINES = ("auto", "numpy", "onnx")
+
+# Tolerances for the parity check against session.run
+PARITY_RTOL = 1e-4
+PARITY_ATOL = 1e-5
+
+# Element-wise activations the fast path can apply to the final affine value
+ACTIVATIONS = {
+    # tanh form of the sigmoid, it does not overflow for large negative inputs
+    "Sigmoid": lambda z: 0.5 * (np.tanh(0.5 * z) + 1.0),
+    "Tanh": np.tanh,
+    "Relu": lambda z: np.maximum(z, 0.0),
+    None: lambda z: z
+}
+
+
+class UnsupportedGraph(Exception):
+    """Raised when a graph is not an affine map of the features followed by one activation"""
+
+
+class _Affine:
+    """Symbolic value X @ weights + bias over the six features, with weights [6, k] and bias [k]"""
+
+    def __init__(self, weights, bias, activation=None):
+        self.weights = weights
+        self.bias = bias
+        self.activation = activation
+
+
+def _broadcast_vector(value, width):
+    """A constant that broadcasts over [N, width] as a per-column vector, or None if it does not"""
+    value = np.asarray(value, dtype=np.float64)
+    if value.size == 1:
+        return np.full(width, value.reshape(-1)[0])
+    if value.ndim <= 2 and value.shape[-1] == width and value.size == width:
+        return value.reshape(width)
+    return None
+
+
+def _affine_inputs(graph, initializer_names):
+    """Affine forms of the graph inputs, for per-feature [N, 1] inputs or a single [N, 6] input"""
+    inputs = [value for value in graph.input if value.name not in initializer_names]
+    if [value.name for value in inputs] == FEATURE_NAMES:
+        identity = np.eye(len(FEATURE_NAMES))
+        return {name: _Affine(identity[:, i:i + 1], np.zeros(1)) for i, name in enumerate(FEATURE_NAMES)}
+    if len(inputs) == 1:
+        dims = inputs[0].type.tensor_type.shape.dim
+        if len(dims) == 2 and dims[1].dim_value == len(FEATURE_NAMES):
+            return {inputs[0].name: _Affine(np.eye(len(FEATURE_NAMES)), np.zeros(len(FEATURE_NAMES)))}
+    raise UnsupportedGraph("inputs are neither the six feature columns nor one [N, 6] tensor")
+
+
+def _combine(op, a, b):
+    """Apply a binary op where at least one side is affine and the result stays affine"""
+    a_affine, b_affine = isinstance(a, _Affine), isinstance(b, _Affine)
+    if op in ("Add", "Sub") and a_affine and b_affine:
+        sign = 1.0 if op == "Add" else -1.0
+        if a.weights.shape != b.weights.shape:
+            raise UnsupportedGraph(f"{op} of affine values with different widths")
+        return _Affine(a.weights + sign * b.weights, a.bias + sign * b.bias)
+    if a_affine and b_affine:
+        raise UnsupportedGraph(f"{op} of two feature-dependent values is not affine")
+
+    affine, constant = (a, b) if a_affine else (b, a)
+    vector = _broadcast_vector(constant, affine.weights.shape[1])
+    if vector is None:
+        raise UnsupportedGraph(f"{op} with a constant of shape {np.shape(constant)}")
+    if op == "Add":
+        return _Affine(affine.weights, affine.bias + vector)
+    if op == "Sub":
+        if a_affine:
+            return _Affine(affine.weights, affine.bias - vector)
+        return _Affine(-affine.weights, vector - affine.bias)
+    if op == "Mul":
+        return _Affine(affine.weights * vector, affine.bias * vector)
+    if op == "Div" and a_affine:
+        return _Affine(affine.weights / vector, affine.bias / vector)
+    raise UnsupportedGraph(f"{op} with the features in the denominator")
+
+
+def _matmul(a, b):
+    if not isinstance(a, _Affine) or isinstance(b, _Affine):
+        raise UnsupportedGraph("MatMul must multiply the features by a constant")
+    b = np.asarray(b, dtype=np.float64)
+    if b.ndim != 2 or b.shape[0] != a.weights.shape[1]:
+        raise UnsupportedGraph(f"MatMul with a constant of shape {b.shape}")
+    return _Affine(a.weights @ b, a.bias @ b)
+
+
+def extract_affine(model):
+    """Reduce an ONNX model to weights [6, k], bias [k] and an activation, or raise UnsupportedGraph"""
+    from onnx import numpy_helper
+
+    graph = model.graph
+    if len(graph.output) != 1:
+        raise UnsupportedGraph("graph has more than one output")
+    initializer_names = {initializer.name for initializer in graph.initializer}
+    values = {initializer.name: numpy_helper.to_array(initializer) for initializer in graph.initializer}
+    values.update(_affine_inputs(graph, initializer_names))
+
+    for node in graph.node:
+        try:
+            args = [values[name] for name in node.input]
+        except KeyError as e:
+            raise UnsupportedGraph(f"{node.op_type} node reads unknown tensor {e}")
+        for arg in args:
+            if isinstance(arg, _Affine) and arg.activation is not None:
+                raise UnsupportedGraph(f"{node.op_type} after {arg.activation}")
+        attributes = {attribute.name: attribute for attribute in node.attribute}
+
+        if node.op_type == "Constant" and "value" in attributes:
+            result = numpy_helper.to_array(attributes["value"].t)
+        elif not any(isinstance(arg, _Affine) for arg in args):
+            raise UnsupportedGraph(f"{node.op_type} on constants only, fold constants first")
+        elif node.op_type in ("Add", "Sub", "Mul", "Div") and len(args) == 2:
+            result = _combine(node.op_type, *args)
+        elif node.op_type == "MatMul":
+            result = _matmul(*args)
+        elif node.op_type == "Gemm" and len(args) in (2, 3):
+            alpha = attributes["alpha"].f if "alpha" in attributes else 1.0
+            beta = attributes["beta"].f if "beta" in attributes else 1.0
+            if "transA" in attributes and attributes["transA"].i:
+                raise UnsupportedGraph("Gemm with transA")
+            matrix = np.asarray(args[1], dtype=np.float64)
+            if "transB" in attributes and attributes["transB"].i:
+                matrix = matrix.T
+            result = _matmul(args[0], alpha * matrix)
+            if len(args) == 3:
+                result = _combine("Add", result, beta * np.asarray(args[2], dtype=np.float64))
+        elif node.op_type == "Identity":
+            result = args[0]
+        elif node.op_type in ACTIVATIONS:
+            result = _Affine(args[0].weights, args[0].bias, node.op_type)
+        else:
+            raise UnsupportedGraph(f"unsupported operator {node.op_type}")
+        values[node.output[0]] = result
+
+    output = values.get(graph.output[0].name)
+    if not isinstance(output, _Affine):
+        raise UnsupportedGraph("output does not depend on the features")
+    return output.weights, output.bias, output.activation
+
+
+class _TensorInfo:
+    def __init__(self, name):
+        self.name = name
+
+
+class LinearModel:
+    """Affine map plus activation evaluated with one NumPy matrix product, no runtime dispatch"""
+
+    def __init__(self, weights, bias, activation=None, input_names=FEATURE_NAMES, output_name="output"):
+        # Stored as [k, 6] so feature-major [6, N] columns multiply without a transpose
+        self.weights = np.ascontiguousarray(np.asarray(weights, dtype=np.float32).T)
+        self.bias = np.asarray(bias, dtype=np.float32).reshape(-1, 1)
+        self.activation = activation
+        self._activate = ACTIVATIONS[activation]
+        self.input_names = list(input_names)
+        self.output_name = output_name
+
+    def predict_columns(self, columns):
+        """Predictions [N, k] for feature-major [6, N] columns"""
+        return self._activate(self.weights @ columns + self.bias).T.astype(np.float32, copy=False)
+
+    # The session interface, so anything written against session.run keeps working
+    def get_inputs(self):
+        return [_TensorInfo(name) for name in self.input_names]
+
+    def get_outputs(self):
+        return [_TensorInfo(self.output_name)]
+
+    def run(self, output_names, input_dict):
+        if len(self.input_names) == 1:
+            columns = np.asarray(input_dict[self.input_names[0]], dtype=np.float32).T
+        else:
+            columns = np.stack([np.asarray(input_dict[name], dtype=np.float32).reshape(-1) for name in self.input_names])
+        return [self.predict_columns(columns)]
+
+
+def compile_model(model):
+    """Build a LinearModel from an ONNX model proto, or raise UnsupportedGraph"""
+    weights, bias, activation = extract_affine(model)
+    initializer_names = {initializer.name for initializer in model.graph.initializer}
+    input_names = [value.name for value in model.graph.input if value.name not in initializer_names]
+    return LinearModel(weights, bias, activation, input_names, model.graph.output[0].name)
+
+
+def parity_rows(n_rows=256, seed=0):
+    """Deterministic [6, N] test columns spread over and beyond the usual feature ranges"""
+    rng = np.random.default_rng(seed)
+    scale = np.array([100.0, 25.0, 70.0, 6.5, 50.0, 0.3], dtype=np.float32).reshape(-1, 1)
+    columns = scale * rng.uniform(-2.0, 4.0, size=(len(FEATURE_NAMES), n_rows)).astype(np.float32)
+    columns[:, 0] = 0.0
+    return columns
+
+
+def check_parity(engine, session, columns=None):
+    """Largest absolute difference between the engine and session.run, and whether it is within tolerance"""
+    columns = parity_rows() if columns is None else columns
+    expected = run_batch(session, columns)
+    actual = run_batch(engine, columns)
+    if expected.shape != actual.shape:
+        return float("inf"), False
+    max_error = float(np.max(np.abs(expected.astype(np.float64) - actual)))
+    return max_error, bool(np.allclose(actual, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL))
+
+
+def select_engine(session, model_path, engine="auto"):
+    """Return (runner, kind): the NumPy engine when the graph allows it and matches the session, else the session"""
+    if engine not in ENGINES:
+        raise ValueError(f"Engine must be one of {', '.join(ENGINES)}")
+    if engine == "onnx":
+        return session, "onnx"
+
+    import onnx
+
+    try:
+        fast = compile_model(onnx.load(model_path))
+    except UnsupportedGraph as e:
+        print(f"NumPy engine does not support {model_path} ({e}), using ONNX Runtime")
+        return session, "onnx"
+    max_error, ok = check_parity(fast, session)
+    if not ok:
+        print(f"NumPy engine for {model_path} differs from ONNX Runtime by {max_error:.2e}, using ONNX Runtime")
+        return session, "onnx"
+    print(f"Using NumPy engine for {model_path} (max difference {max_error:.2e})")
+    return fast, "numpy"
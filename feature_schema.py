@@ -0,0 +1,149 @@
+import json
+import os
+import numpy as np
+from inference import FEATURE_NAMES
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_schema.json")
+
+# Errors reported per request, the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def drop_row(errors, position):
+    """Remove the row index from error locations, for requests that carry a single record"""
+    for error in errors:
+        del error["loc"][position:position + 1]
+    return errors
+
+
+class FeatureSchema:
+    """Names, dtypes and valid ranges of the model features, checked over whole columns at once"""
+
+    def __init__(self, features):
+        by_name = {feature["name"]: feature for feature in features}
+        missing = [name for name in FEATURE_NAMES if name not in by_name]
+        if missing:
+            raise ValueError(f"Feature schema is missing {', '.join(missing)}")
+        # Kept in the order the model takes the features
+        self.features = [by_name[name] for name in FEATURE_NAMES]
+        self.names = list(FEATURE_NAMES)
+        self.dtype = np.dtype(self.features[0].get("dtype", "float32"))
+        if any(np.dtype(feature.get("dtype", "float32")) != self.dtype for feature in self.features):
+            raise ValueError("All features must share one dtype")
+        self.minimums = np.array([feature.get("min", -np.inf) for feature in self.features], dtype=np.float64).reshape(-1, 1)
+        self.maximums = np.array([feature.get("max", np.inf) for feature in self.features], dtype=np.float64).reshape(-1, 1)
+
+    @classmethod
+    def load(cls, path=DEFAULT_SCHEMA_PATH):
+        with open(path) as f:
+            return cls(json.load(f)["features"])
+
+    def describe(self, name):
+        """JSON schema keywords for one feature, for the OpenAPI docs"""
+        feature = self.features[self.names.index(name)]
+        return {key: feature[schema_key] for key, schema_key in (("minimum", "min"), ("maximum", "max")) if schema_key in feature}
+
+    def check(self, columns):
+        """Rows and features of [6, N] columns that are not finite or out of range, as (row, feature index) arrays"""
+        columns = np.asarray(columns)
+        # NaN fails both comparisons, so one mask covers NaN, inf and range
+        valid = (columns >= self.minimums) & (columns <= self.maximums)
+        feature_indices, rows = np.nonzero(~valid)
+        order = np.argsort(rows, kind="stable")
+        return rows[order], feature_indices[order]
+
+    def value_error(self, index, value):
+        """Error type and message for a value of the feature at index that fails the range check"""
+        if not np.isfinite(value):
+            return "finite_number", "Input should be a finite number"
+        feature = self.features[index]
+        return "out_of_range", f"Input should be between {feature.get('min')} and {feature.get('max')}"
+
+    def range_errors(self, columns, loc=()):
+        """Validation errors in FastAPI's format for rows that fail the range check"""
+        rows, feature_indices = self.check(columns)
+        errors = []
+        for row, index in zip(rows[:MAX_REPORTED_ERRORS].tolist(), feature_indices[:MAX_REPORTED_ERRORS].tolist()):
+            name = self.names[index]
+            value = float(np.asarray(columns[index])[row])
+            error_type, message = self.value_error(index, value)
+            errors.append({"type": error_type, "loc": [*loc, row, name], "msg": message, "input": value if np.isfinite(value) else str(value)})
+        return errors, len(rows)
+
+    def columns_from_records(self, records, loc=()):
+        """Build [6, N] columns from a list of record dicts, returning (columns, errors)"""
+        if not isinstance(records, list):
+            return None, [{"type": "list_type", "loc": list(loc), "msg": "Input should be a valid list", "input": None}]
+        n_rows = len(records)
+        columns = np.empty((len(self.names), n_rows), dtype=self.dtype)
+        try:
+            for i, name in enumerate(self.names):
+                columns[i] = np.fromiter((record[name] for record in records), dtype=np.float64, count=n_rows)
+                # NumPy reads null as NaN, only NaN rows need a look at the raw values
+                missing = np.flatnonzero(np.isnan(columns[i]))
+                if len(missing) and any(records[row][name] is None for row in missing.tolist()):
+                    raise TypeError("null value")
+        except (KeyError, TypeError, ValueError):
+            # Only a malformed request pays for the row-by-row scan that locates the problem
+            errors = self._record_errors(records, loc)
+            return None, errors or [{"type": "float_parsing", "loc": list(loc), "msg": "Records should contain numbers only", "input": None}]
+        return columns, []
+
+    def columns_from_record(self, record, loc=()):
+        """Build [6, 1] columns from one record dict, returning (columns, errors)"""
+        if not isinstance(record, dict):
+            return None, [{"type": "dict_type", "loc": list(loc), "msg": "Input should be a valid dictionary", "input": None}]
+        columns, errors = self.columns_from_records([record], loc)
+        return columns, drop_row(errors, len(loc))
+
+    def columns_from_mapping(self, mapping, loc=()):
+        """Build [6, N] columns from a {"feature": [values]} mapping, returning (columns, errors)"""
+        if not isinstance(mapping, dict):
+            return None, [{"type": "dict_type", "loc": list(loc), "msg": "Input should be a valid dictionary", "input": None}]
+        errors = []
+        arrays = []
+        for name in self.names:
+            values = mapping.get(name)
+            if not isinstance(values, list):
+                errors.append({"type": "missing" if values is None else "list_type", "loc": [*loc, name], "msg": "Field required" if values is None else "Input should be a valid list", "input": None})
+                continue
+            try:
+                arrays.append(np.array(values, dtype=np.float64))
+            except (TypeError, ValueError):
+                errors.append({"type": "float_parsing", "loc": [*loc, name], "msg": "Input should be a list of numbers", "input": None})
+                continue
+            if arrays[-1].ndim != 1:
+                errors.append({"type": "float_parsing", "loc": [*loc, name], "msg": "Input should be a list of numbers", "input": None})
+                continue
+            # null is read as NaN, report it the way a null record field is reported
+            for row in np.flatnonzero(np.isnan(arrays[-1]))[:MAX_REPORTED_ERRORS].tolist():
+                if values[row] is None:
+                    errors.append({"type": "float_type", "loc": [*loc, name, row], "msg": "Input should be a valid number", "input": None})
+        if errors:
+            return None, errors
+        lengths = {len(array) for array in arrays}
+        if len(lengths) != 1:
+            return None, [{"type": "value_error", "loc": list(loc), "msg": "All feature columns must have the same length", "input": None}]
+        return np.stack(arrays).astype(self.dtype), []
+
+    def _record_errors(self, records, loc):
+        errors = []
+        for row, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors.append({"type": "dict_type", "loc": [*loc, row], "msg": "Input should be a valid dictionary", "input": None})
+                continue
+            for name in self.names:
+                if name not in record:
+                    errors.append({"type": "missing", "loc": [*loc, row, name], "msg": "Field required", "input": None})
+                    continue
+                value = record[name]
+                if value is None or not isinstance(value, (int, float, str)):
+                    errors.append({"type": "float_type", "loc": [*loc, row, name], "msg": "Input should be a valid number", "input": value})
+                    continue
+                try:
+                    float(value)
+                except ValueError:
+                    errors.append({"type": "float_parsing", "loc": [*loc, row, name], "msg": "Input should be a valid number, unable to parse string as a number", "input": value})
+            if len(errors) >= MAX_REPORTED_ERRORS:
+                break
+        return errors[:MAX_REPORTED_ERRORS]
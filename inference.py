@@ -0,0 +1,41 @@
+import numpy as np
+from session_config import create_session
+
+# Input features in the order the model expects them
+FEATURE_NAMES = ['rainfall', 'temperature', 'humidity', 'soil_ph', 'fertilizer_usage', 'risk_score']
+
+DEFAULT_MODEL_PATH = "working_agricultural_model.onnx"
+
+
+def load_session(model_path=DEFAULT_MODEL_PATH):
+    """Load the ONNX model, returning None if it cannot be loaded"""
+    try:
+        # Session options come from the ORT_* environment variables
+        session = create_session(model_path)
+        print("Model loaded successfully")
+        return session
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        return None
+
+
+def make_feeds(session, columns):
+    """Build the session input dict from six feature columns"""
+    n_rows = len(columns[0])
+    inputs = session.get_inputs()
+    if len(inputs) == 1:
+        # Models with a single [N, 6] input take the features row by row
+        return {inputs[0].name: np.stack(columns, axis=1).astype(np.float32, copy=False)}
+    # Per-feature models take contiguous [N, 1] views of each column
+    return {feature: columns[i].reshape(n_rows, 1) for i, feature in enumerate(FEATURE_NAMES)}
+
+
+def run_batch(session, columns):
+    """Run one session call over every row of six feature columns"""
+    # Engines that take feature-major columns directly skip building feeds
+    predict_columns = getattr(session, "predict_columns", None)
+    if predict_columns is not None:
+        return predict_columns(columns)
+    output_name = session.get_outputs()[0].name
+    result = session.run([output_name], make_feeds(session, columns))
+    return result[0]
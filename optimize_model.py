@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import onnx
+from onnx import helper, numpy_helper
+from fast_path import UnsupportedGraph, extract_affine, parity_rows
+from inference import DEFAULT_MODEL_PATH, FEATURE_NAMES, run_batch
+from session_config import PROVIDERS, create_session, model_fingerprint, optimization_report_path
+
+# Variants beyond the fused float32 graph that can be requested with --variants
+OPTIONAL_VARIANTS = ("fp16", "int8")
+
+# Batch sizes each artifact is timed at
+TIMING_BATCH_SIZES = (1, 64, 10000)
+
+# Name of the single fused input
+FUSED_INPUT = "features"
+
+
+def fold_constants(model_path, output_path):
+    """Let onnxruntime's basic, provider-independent passes fold constants and drop redundant nodes"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    options.optimized_model_filepath = output_path
+    ort.InferenceSession(model_path, options, providers=PROVIDERS)
+    return onnx.load(output_path)
+
+
+def build_affine_model(weights, bias, activation, output_name, source, dtype=np.float32):
+    """One [N, 6] input through MatMul + Add and the activation, computed in dtype"""
+    tensor_type = helper.np_dtype_to_tensor_dtype(np.dtype(dtype))
+    width = weights.shape[1]
+    initializers = [
+        numpy_helper.from_array(weights.astype(dtype), "fused_weights"),
+        numpy_helper.from_array(bias.reshape(1, width).astype(dtype), "fused_bias")
+    ]
+
+    nodes = []
+    features = FUSED_INPUT
+    if dtype != np.float32:
+        nodes.append(helper.make_node("Cast", [FUSED_INPUT], ["features_cast"], to=tensor_type, name="cast_input"))
+        features = "features_cast"
+    nodes.append(helper.make_node("MatMul", [features, "fused_weights"], ["linear"], name="matmul"))
+    result = "linear_bias"
+    nodes.append(helper.make_node("Add", ["linear", "fused_bias"], [result], name="add_bias"))
+    if activation is not None:
+        nodes.append(helper.make_node(activation, [result], ["activated"], name=activation.lower()))
+        result = "activated"
+    if dtype != np.float32:
+        nodes.append(helper.make_node("Cast", [result], ["output_cast"], to=onnx.TensorProto.FLOAT, name="cast_output"))
+    # The last node writes the graph output directly
+    nodes[-1].output[0] = output_name
+
+    graph = helper.make_graph(
+        nodes,
+        f"{source.graph.name}_fused",
+        [helper.make_tensor_value_info(FUSED_INPUT, onnx.TensorProto.FLOAT, ["batch", len(FEATURE_NAMES)])],
+        [helper.make_tensor_value_info(output_name, onnx.TensorProto.FLOAT, ["batch", width])],
+        initializer=initializers
+    )
+    model = helper.make_model(graph, producer_name="optimize_model", opset_imports=list(source.opset_import))
+    model.ir_version = source.ir_version
+    model = onnx.shape_inference.infer_shapes(model)
+    onnx.checker.check_model(model)
+    return model
+
+
+def quantize_int8(model_path, output_path):
+    """Dynamic int8 quantization of the MatMul weights with onnxruntime's quantizer"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+
+
+def time_session(session, batch_sizes=TIMING_BATCH_SIZES, min_seconds=0.2):
+    """Median microseconds per call at each batch size"""
+    latencies = {}
+    for batch_size in batch_sizes:
+        columns = parity_rows(batch_size, seed=1)
+        run_batch(session, columns)
+        samples = []
+        deadline = time.perf_counter() + min_seconds
+        while time.perf_counter() < deadline or len(samples) < 5:
+            start = time.perf_counter()
+            run_batch(session, columns)
+            samples.append(time.perf_counter() - start)
+        latencies[str(batch_size)] = float(np.median(samples) * 1e6)
+    return latencies
+
+
+def parity(reference, candidate, columns):
+    expected = run_batch(reference, columns).astype(np.float64)
+    actual = run_batch(candidate, columns).astype(np.float64)
+    if expected.shape != actual.shape:
+        return float("inf"), float("inf")
+    errors = np.abs(expected - actual)
+    return float(errors.max()), float(errors.mean())
+
+
+def optimize(model_path, output_dir=None, variants=(), tolerance=1e-5, rank_batch_size=64):
+    """Write optimized variants of a model and a parity and latency report next to it"""
+    output_dir = output_dir or os.path.dirname(os.path.abspath(model_path))
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    artifact = lambda name: os.path.join(output_dir, f"{stem}.{name}.onnx")
+    # Artifact paths in the report are relative to the report, which sits next to the model
+    report_path = optimization_report_path(model_path)
+    report_dir = os.path.dirname(os.path.abspath(report_path))
+    relative = lambda path: os.path.relpath(os.path.abspath(path), report_dir)
+
+    print(f"Loading model from {model_path}...")
+    original = onnx.shape_inference.infer_shapes(onnx.load(model_path))
+    onnx.checker.check_model(original)
+    output_name = original.graph.output[0].name
+    print(f"Original graph: {len(original.graph.node)} nodes, {len(original.graph.input)} inputs")
+
+    candidates = {"original": model_path}
+
+    folded = fold_constants(model_path, artifact("folded"))
+    print(f"✓ Constant folding: {len(folded.graph.node)} nodes")
+    candidates["folded"] = artifact("folded")
+
+    try:
+        weights, bias, activation = extract_affine(folded)
+    except UnsupportedGraph as e:
+        print(f"✗ Graph is not affine, skipping fusion: {e}")
+    else:
+        onnx.save(build_affine_model(weights, bias, activation, output_name, original), artifact("fused"))
+        print(f"✓ Fused into one [N, {len(FEATURE_NAMES)}] input with MatMul + Add{' + ' + activation if activation else ''}")
+        candidates["fused"] = artifact("fused")
+        if "fp16" in variants:
+            onnx.save(build_affine_model(weights, bias, activation, output_name, original, np.float16), artifact("fused-fp16"))
+            candidates["fused-fp16"] = artifact("fused-fp16")
+        if "int8" in variants:
+            quantize_int8(artifact("fused"), artifact("fused-int8"))
+            candidates["fused-int8"] = artifact("fused-int8")
+
+    # Compare every artifact with the original on the same rows
+    reference = create_session(model_path)
+    columns = parity_rows(4096)
+    report = {
+        "source": os.path.basename(model_path),
+        "source_fingerprint": model_fingerprint(model_path),
+        "tolerance": tolerance,
+        "rank_batch_size": str(rank_batch_size),
+        "variants": []
+    }
+    print(f"\n{'variant':<12} {'max error':>10} {'mean error':>10} " + " ".join(f"{f'{size} rows':>12}" for size in TIMING_BATCH_SIZES))
+    for name, path in candidates.items():
+        try:
+            session = create_session(path)
+            max_error, mean_error = parity(reference, session, columns)
+            latencies = time_session(session, TIMING_BATCH_SIZES + (rank_batch_size,))
+        except Exception as e:
+            print(f"✗ {name}: {e}")
+            report["variants"].append({"name": name, "path": relative(path), "error": str(e), "equivalent": False})
+            continue
+        report["variants"].append({
+            "name": name,
+            "path": relative(path),
+            "max_abs_error": max_error,
+            "mean_abs_error": mean_error,
+            "equivalent": max_error <= tolerance,
+            "latency_us": latencies
+        })
+        marker = "✓" if max_error <= tolerance else "✗"
+        print(f"{marker} {name:<10} {max_error:10.2e} {mean_error:10.2e} " + " ".join(f"{latencies[str(size)]:10.1f}us" for size in TIMING_BATCH_SIZES))
+
+    # The server loads the fastest artifact that stays within tolerance
+    equivalent = [variant for variant in report["variants"] if variant["equivalent"]]
+    best = min(equivalent, key=lambda variant: variant["latency_us"][str(rank_batch_size)])
+    report["selected"] = best["name"]
+    report["selected_path"] = best["path"]
+
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Selected '{best['name']}' ({best['latency_us'][str(rank_batch_size)]:.1f}us at {rank_batch_size} rows)")
+    print(f"✓ Report written to {report_path}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuse, fold and quantize a model, and report parity with the original")
+    parser.add_argument("model", nargs="?", default=DEFAULT_MODEL_PATH, help="ONNX model to optimize")
+    parser.add_argument("--output-dir", help="Directory for the artifacts (default: next to the model)")
+    parser.add_argument("--variants", default="", help=f"Extra variants to build: {', '.join(OPTIONAL_VARIANTS)}")
+    parser.add_argument("--tolerance", type=float, default=1e-5, help="Largest absolute difference that still counts as equivalent")
+    parser.add_argument("--rank-batch-size", type=int, default=64, help="Batch size used to pick the fastest artifact")
+    args = parser.parse_args(argv)
+
+    variants = [variant.strip() for variant in args.variants.split(",") if variant.strip()]
+    unknown = set(variants) - set(OPTIONAL_VARIANTS)
+    if unknown:
+        print(f"Error: unknown variants {', '.join(sorted(unknown))}")
+        return 1
+    if not os.path.exists(args.model):
+        print(f"Error: {args.model} not found!")
+        return 1
+
+    print("=== Optimizing ONNX Model ===")
+    optimize(args.model, args.output_dir, variants, args.tolerance, args.rank_batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
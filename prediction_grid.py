@@ -0,0 +1,197 @@
+import os
+import numpy as np
+from inference import FEATURE_NAMES, run_batch
+
+# Rows per model call while filling the table, bounds the memory of the input columns
+BUILD_CHUNK_ROWS = 1_000_000
+
+
+def parse_axis(spec):
+    """Parse 'start:stop:step' (stop included) or 'v1|v2|v3' into sorted float32 grid values"""
+    if ":" in spec:
+        start, stop, step = (float(part) for part in spec.split(":"))
+        if step <= 0 or stop < start:
+            raise ValueError(f"Grid range '{spec}' must have start <= stop and a positive step")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        # Round in float64 so 0.1 steps land on the same float32 values a client would send
+        values = np.round(start + np.arange(count) * step, 10)
+    else:
+        values = np.array([float(value) for value in spec.split("|")])
+    return np.unique(values.astype(np.float32))
+
+
+def parse_grid(spec):
+    """Parse 'soil_ph=0:14:0.1,fertilizer_usage=0|50|100,...' into one axis per feature, in model order"""
+    axes = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        feature, axis = part.split("=", 1)
+        feature = feature.strip()
+        if feature not in FEATURE_NAMES:
+            raise ValueError(f"Unknown feature '{feature}' in prediction grid")
+        axes[feature] = parse_axis(axis.strip())
+    if not axes:
+        return None
+    missing = [feature for feature in FEATURE_NAMES if feature not in axes]
+    if missing:
+        raise ValueError(f"Prediction grid needs an axis for every feature, missing {', '.join(missing)}")
+    return [axes[feature] for feature in FEATURE_NAMES]
+
+
+def grid_path(model_path):
+    """Where the table for a model is kept, next to the model file"""
+    return f"{os.path.splitext(model_path)[0]}.grid.npz"
+
+
+class PredictionGrid:
+    """Model outputs precomputed over a grid of feature values, stored as one float32 ndarray"""
+
+    def __init__(self, axes, table, fingerprint=""):
+        self.axes = axes
+        # [len(axis_0), ..., len(axis_5), output width]
+        self.table = table
+        self.fingerprint = fingerprint
+        self._flat = table.reshape(-1, table.shape[-1])
+        lengths = np.array([len(axis) for axis in axes], dtype=np.int64)
+        self._strides = np.array([int(np.prod(lengths[i + 1:])) for i in range(len(axes))], dtype=np.int64)
+        self._last = (lengths - 1).reshape(-1, 1)
+        self._rows = np.arange(len(axes)).reshape(-1, 1)
+        # Float copies for the exact lookup, which keeps its index arithmetic in floating point
+        self._last_float = self._last.astype(np.float32)
+        self._flat_strides = self._strides.astype(np.float64)
+        # Axes side by side, padded with NaN, which never equals a requested value
+        self._padded = np.full((len(axes), int(lengths.max())), np.nan, dtype=np.float32)
+        for i, axis in enumerate(axes):
+            self._padded[i, :len(axis)] = axis
+        # Evenly spaced axes find their index arithmetically, the others by binary search
+        self._starts = np.zeros((len(axes), 1), dtype=np.float32)
+        self._steps = np.ones((len(axes), 1))
+        self._searched = []
+        for i, axis in enumerate(axes):
+            gaps = np.diff(axis.astype(np.float64))
+            if len(axis) > 1 and np.allclose(gaps, gaps[0], rtol=1e-4, atol=0):
+                self._starts[i] = axis[0]
+                self._steps[i] = gaps[0]
+            elif len(axis) > 1:
+                self._searched.append(i)
+        # Flat offset of every corner of a grid cell, an axis with one value has no upper neighbour
+        offsets = np.zeros(1, dtype=np.int64)
+        for i in range(len(axes)):
+            offsets = np.concatenate([offsets, offsets + (self._strides[i] if lengths[i] > 1 else 0)])
+        self._corner_offsets = offsets
+        self._row_offsets = (self._rows * self._padded.shape[1]).astype(np.float32)
+        self._inverse_steps = (1.0 / self._steps).astype(np.float32)
+
+    @property
+    def cells(self):
+        return self._flat.shape[0]
+
+    @classmethod
+    def build(cls, session, axes, fingerprint=""):
+        """Score every grid point with large vectorized model calls"""
+        shape = [len(axis) for axis in axes]
+        cells = int(np.prod(shape))
+        table = None
+        for start in range(0, cells, BUILD_CHUNK_ROWS):
+            indices = np.unravel_index(np.arange(start, min(start + BUILD_CHUNK_ROWS, cells)), shape)
+            columns = np.stack([axis[index] for axis, index in zip(axes, indices)])
+            result = np.asarray(run_batch(session, columns), dtype=np.float32).reshape(len(columns[0]), -1)
+            if table is None:
+                table = np.empty((cells, result.shape[1]), dtype=np.float32)
+            table[start:start + len(result)] = result
+        return cls(axes, table.reshape(*shape, -1), fingerprint)
+
+    @classmethod
+    def load(cls, path, axes, fingerprint):
+        """The stored table, or None when it is missing or was built for another grid or model"""
+        try:
+            with np.load(path) as data:
+                if str(data["fingerprint"]) != fingerprint:
+                    return None
+                stored = [data[f"axis_{i}"] for i in range(len(FEATURE_NAMES))]
+                if any(len(a) != len(b) or not np.array_equal(a, b) for a, b in zip(stored, axes)):
+                    return None
+                return cls(axes, data["table"], fingerprint)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, path):
+        # Written to a temporary file and moved into place, so a reader never sees half a table
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        arrays = {f"axis_{i}": axis for i, axis in enumerate(self.axes)}
+        np.savez(tmp_path, table=self.table, fingerprint=np.array(self.fingerprint), **arrays)
+        os.replace(tmp_path, path)
+
+    def lookup(self, columns, interpolate=False):
+        """Table values for rows on the grid as ([N, width] values, [N] hit mask), misses are left zero"""
+        columns = np.asarray(columns, dtype=np.float32)
+        if interpolate:
+            return self._interpolate(columns)
+        index = np.rint((columns - self._starts) * self._inverse_steps)
+        for i in self._searched:
+            index[i] = np.searchsorted(self.axes[i], columns[i])
+        # In place instead of np.clip, which is slow on small arrays, and fmax/fmin map NaN into range too
+        np.fmax(index, 0, out=index)
+        np.fmin(index, self._last_float, out=index)
+        # A row hits when the nearest grid value of every feature is the value itself
+        nearest = self._padded.ravel()[(index + self._row_offsets).astype(np.intp)]
+        hit = np.logical_and.reduce(nearest == columns, axis=0)
+        values = np.zeros((columns.shape[1], self._flat.shape[1]), dtype=np.float32)
+        # Float matmul for the flat offsets, integer matmul does not go through BLAS
+        values[hit] = self._flat[(self._flat_strides @ index[:, hit]).astype(np.intp)]
+        return values, hit
+
+    def _interpolate(self, columns):
+        """Multilinear interpolation between the surrounding grid points, exact on grid points"""
+        lower = np.floor((columns - self._starts) / self._steps)
+        for i in self._searched:
+            lower[i] = np.searchsorted(self.axes[i], columns[i], side="right") - 1
+        lower = np.fmin(np.fmax(lower, 0), np.maximum(self._last - 1, 0)).astype(np.int64)
+        below = self._padded[self._rows, lower].astype(np.float64)
+        above = self._padded[self._rows, np.minimum(lower + 1, self._last)].astype(np.float64)
+        span = above - below
+        fractions = np.minimum(np.maximum(np.divide(columns - below, span, out=np.zeros_like(span), where=span > 0), 0.0), 1.0)
+        inside = (columns >= self._padded[:, :1]) & (columns <= self._padded[self._rows, self._last])
+        hit = np.logical_and.reduce(inside, axis=0)
+
+        # Weights of the 2^6 corners of the enclosing cell, in the order of the corner offsets
+        weights = np.ones((1, columns.shape[1]))
+        for fraction in fractions:
+            weights = np.concatenate([weights * (1.0 - fraction), weights * fraction])
+        corners = self._flat[(self._strides @ lower)[None, :] + self._corner_offsets[:, None]]
+        values = np.einsum("cn,cnw->nw", weights, corners)
+        values[~hit] = 0.0
+        return values.astype(np.float32), hit
+
+
+class GridModel:
+    """Model runner that answers rows on the grid from the table and scores the rest live"""
+
+    def __init__(self, runner, grid, interpolate=False):
+        self.runner = runner
+        self.grid = grid
+        self.interpolate = interpolate
+        self.hits = 0
+        self.misses = 0
+
+    def predict_columns(self, columns):
+        values, hit = self.grid.lookup(columns, self.interpolate)
+        n_hits = int(hit.sum())
+        self.hits += n_hits
+        self.misses += len(hit) - n_hits
+        if n_hits == len(hit):
+            return values
+        if n_hits == 0:
+            return run_batch(self.runner, columns)
+        miss = ~hit
+        miss_columns = np.ascontiguousarray(np.asarray(columns)[:, miss])
+        values[miss] = np.asarray(run_batch(self.runner, miss_columns)).reshape(int(miss.sum()), -1)
+        return values
+
+    def stats(self):
+        return {"cells": self.grid.cells, "interpolate": self.interpolate, "hits": self.hits, "misses": self.misses}
+
+    # Everything else is the wrapped runner
+    def __getattr__(self, name):
+        return getattr(self.runner, name)
@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import threading
+import time
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def profile_path(directory, kind, suffix=""):
+    """Timestamped file name for a profile in directory"""
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    return os.path.join(directory, f"{kind}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}{suffix}")
+
+
+class SamplingProfiler:
+    """Sample the Python stacks of every thread for a bounded window and write a speedscope profile
+
+    Nothing is installed on the request path. A background thread reads sys._current_frames()
+    every interval while a profile is running, and does not exist otherwise.
+    """
+
+    def __init__(self, directory, interval=0.005, max_seconds=60.0):
+        self.directory = directory
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.last_path = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds):
+        """Sample for up to seconds, capped at max_seconds, raising RuntimeError if already running"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A Python profile is already running")
+            seconds = min(seconds, self.max_seconds)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, args=(seconds,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return seconds
+
+    def stop(self):
+        """End the running profile early and return the path it was written to"""
+        thread = self._thread
+        if thread is None:
+            raise RuntimeError("No Python profile is running")
+        self._stop.set()
+        thread.join()
+        return self.last_path
+
+    def _sample(self, seconds):
+        own = threading.get_ident()
+        frames = []
+        frame_index = {}
+        # Per thread: stacks as frame indices root first, and the time each sample stands for
+        samples = {}
+        weights = {}
+        start = previous = time.perf_counter()
+        deadline = start + seconds
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    key = (code.co_name, code.co_filename, code.co_firstlineno)
+                    index = frame_index.get(key)
+                    if index is None:
+                        index = frame_index[key] = len(frames)
+                        frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+                    stack.append(index)
+                    frame = frame.f_back
+                stack.reverse()
+                samples.setdefault(ident, []).append(stack)
+                weights.setdefault(ident, []).append(now - previous)
+            previous = now
+            if now >= deadline:
+                break
+        self.last_path = self._write(frames, samples, weights, previous - start)
+
+    def _write(self, frames, samples, weights, elapsed):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        profiles = []
+        for ident, stacks in samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": names.get(ident, f"thread {ident}"),
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights[ident]),
+                "samples": stacks,
+                "weights": weights[ident]
+            })
+        # An idle thread shows the same stack in every sample, the thread whose stack changes most opens first
+        profiles.sort(key=lambda profile: -sum(1 for a, b in zip(profile["samples"], profile["samples"][1:]) if a != b))
+        path = profile_path(self.directory, "python", ".speedscope.json")
+        with open(path, "w") as f:
+            json.dump({
+                "$schema": SPEEDSCOPE_SCHEMA,
+                "name": f"Python profile, {elapsed:.1f}s every {self.interval * 1000:g}ms",
+                "exporter": "profiler.py",
+                "activeProfileIndex": 0,
+                "shared": {"frames": frames},
+                "profiles": profiles
+            }, f)
+        print(f"Python profile written to {path}")
+        return path
@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+import numpy as np
+from inference import DEFAULT_MODEL_PATH, FEATURE_NAMES, run_batch
+from session_config import best_artifact, create_session, model_fingerprint
+from fast_path import ENGINES, select_engine
+from buffer_pool import BoundSession
+from prediction_grid import GridModel, PredictionGrid, grid_path
+
+# Names that collide with fixed routes under /predict
+RESERVED_NAMES = {"batch", "stream", "explain"}
+
+# Representative row used to warm a new session before it takes traffic
+WARMUP_ROW = np.array([100.0, 25.0, 70.0, 6.5, 50.0, 0.3], dtype=np.float32)
+
+
+def parse_models(spec):
+    """Parse 'name=path,name=path' into an ordered list of (name, path) pairs"""
+    models = []
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, path = part.split("=", 1)
+        models.append((name.strip(), path.strip()))
+    return models
+
+
+def models_from_env():
+    """Models to serve from MODELS, falling back to MODEL_PATH as the 'agricultural' model"""
+    model_path = os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH)
+    return parse_models(os.getenv("MODELS", f"agricultural={model_path}"))
+
+
+def engines_from_env(names):
+    """Engine for each model, MODEL_ENGINE for all of them with per-model overrides from MODEL_ENGINES"""
+    default = os.getenv("MODEL_ENGINE", "auto")
+    engines = {name: default for name in names}
+    engines.update(parse_models(os.getenv("MODEL_ENGINES", "")))
+    return engines
+
+
+def warmup(session, batch_sizes=(1,)):
+    """Run a few inferences so the first real request does not pay for lazy initialization"""
+    for batch_size in batch_sizes:
+        columns = np.repeat(WARMUP_ROW.reshape(len(FEATURE_NAMES), 1), batch_size, axis=1)
+        run_batch(session, columns)
+
+
+class ModelEntry:
+    """One loaded version of a named model"""
+
+    def __init__(self, name, path, session, version, kind="onnx", timings=None, artifact=None, profiling=False):
+        self.name = name
+        self.path = path
+        # File the session was actually built from, an optimized variant of path when one is available
+        self.artifact = artifact or path
+        self.session = session
+        self.version = version
+        self.kind = kind
+        # Seconds spent building and warming this version
+        self.timings = timings or {}
+        # Built with onnxruntime's profiler on, see ModelRegistry.start_profiling
+        self.profiling = profiling
+        self.loaded_at = time.time()
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except (OSError, TypeError):
+        return None
+
+
+class ModelRegistry:
+    """Named models that can be rebuilt in the background and swapped in atomically"""
+
+    def __init__(self, warmup_batch_sizes=(1,), use_optimized=True, buffer_pool_rows=0, grid_axes=None, grid_interpolate=False, grid_max_cells=0):
+        self.warmup_batch_sizes = warmup_batch_sizes
+        # Batches up to this many rows run through pre-bound IOBinding buffers, 0 disables them
+        self.buffer_pool_rows = buffer_pool_rows
+        # Load the fastest equivalent artifact listed in a model's optimization report
+        self.use_optimized = use_optimized
+        # Feature values to precompute predictions for, None disables the lookup table
+        self.grid_axes = grid_axes
+        self.grid_interpolate = grid_interpolate
+        self.grid_max_cells = grid_max_cells
+        self._paths = {}
+        self._engines = {}
+        self._entries = {}
+        self._errors = {}
+        self._attempted_stats = {}
+        self._reloading = set()
+        self._locks = {}
+        self._listeners = []
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self._profile_lock = threading.Lock()
+
+    def register(self, name, path, engine="auto"):
+        """Declare a model file under a name, without loading it yet"""
+        if name in RESERVED_NAMES:
+            raise ValueError(f"'{name}' is reserved and cannot be used as a model name")
+        self._paths[name] = path
+        self._locks[name] = threading.Lock()
+        self.set_engine(name, engine)
+
+    def set_engine(self, name, engine):
+        """Choose the engine used from the next load of a model on"""
+        if name not in self._paths:
+            raise KeyError(name)
+        if engine not in ENGINES:
+            raise ValueError(f"Engine must be one of {', '.join(ENGINES)}")
+        self._engines[name] = engine
+
+    def register_mock(self, name="mock"):
+        """Expose the mock model as its own entry, it is never substituted for a real model"""
+        from mock_model import MockModel
+
+        self._paths[name] = None
+        self._locks[name] = threading.Lock()
+        self._entries[name] = ModelEntry(name, None, MockModel(), "mock", kind="mock")
+
+    def add_listener(self, callback):
+        """Call callback(entry) every time a new model version is swapped in"""
+        self._listeners.append(callback)
+
+    def names(self):
+        return list(self._paths)
+
+    def get(self, name):
+        """Return the current entry for a model, or None if it has not loaded"""
+        if name not in self._paths:
+            raise KeyError(name)
+        return self._entries.get(name)
+
+    def load(self, name, session_overrides=None, engine=None):
+        """Build, warm and swap in a model synchronously, returning True on success"""
+        path = self._paths[name]
+        if path is None:
+            return True
+        with self._locks[name]:
+            self._reloading.add(name)
+            self._attempted_stats[name] = _file_stat(path)
+            try:
+                start = time.perf_counter()
+                artifact = best_artifact(path) if self.use_optimized else path
+                session = create_session(artifact, session_overrides)
+                created = time.perf_counter()
+                # The NumPy engine replaces the session only for recognized graphs that match its output
+                runner, kind = select_engine(session, artifact, engine or self._engines[name])
+                if kind == "onnx" and self.buffer_pool_rows and BoundSession.supports(session):
+                    runner = BoundSession(session, self.buffer_pool_rows)
+                selected = time.perf_counter()
+                if self.grid_axes is not None:
+                    runner = GridModel(runner, self._grid(path, artifact, session), self.grid_interpolate)
+                gridded = time.perf_counter()
+                warmup(runner, self.warmup_batch_sizes)
+                timings = {"session": created - start, "engine": selected - created, "warmup": time.perf_counter() - gridded}
+                if self.grid_axes is not None:
+                    timings["grid"] = gridded - selected
+                profiling = bool(session_overrides and session_overrides.get("profile_prefix"))
+                entry = ModelEntry(name, path, runner, model_fingerprint(path), kind=kind, timings=timings, artifact=artifact, profiling=profiling)
+            except Exception as e:
+                print(f"Error loading model '{name}' from {path}: {e}")
+                self._errors[name] = str(e)
+                return False
+            finally:
+                self._reloading.discard(name)
+
+            # A single dict assignment, so requests see either the old or the new session
+            self._entries[name] = entry
+            self._errors.pop(name, None)
+            source = path if artifact == path else f"{artifact}, optimized from {path}"
+            print(f"Model '{name}' loaded from {source} (version {entry.version})")
+
+        for callback in self._listeners:
+            callback(entry)
+        return True
+
+    def _grid(self, path, artifact, session):
+        """The prediction table for a model, read from next to the model file or built and saved there
+
+        The table is keyed on the artifact the session was built from, so selecting another
+        optimized variant rebuilds it.
+        """
+        cells = int(np.prod([len(axis) for axis in self.grid_axes]))
+        if self.grid_max_cells and cells > self.grid_max_cells:
+            raise ValueError(f"Prediction grid has {cells} cells, more than the limit of {self.grid_max_cells}")
+        fingerprint = model_fingerprint(artifact)
+        table_path = grid_path(path)
+        grid = PredictionGrid.load(table_path, self.grid_axes, fingerprint)
+        if grid is not None:
+            print(f"Loaded prediction grid of {cells} cells from {table_path}")
+            return grid
+        # Computed from the ONNX Runtime session, the reference for every engine
+        grid = PredictionGrid.build(session, self.grid_axes, fingerprint)
+        try:
+            grid.save(table_path)
+            print(f"Saved prediction grid of {cells} cells to {table_path}")
+        except OSError as e:
+            print(f"Could not save prediction grid: {e}")
+        return grid
+
+    def load_all(self):
+        """Load every model, returning True if all of them loaded"""
+        results = [self.load(name) for name in self._paths]
+        return all(results)
+
+    def all_loaded(self):
+        return all(name in self._entries for name in self._paths)
+
+    def reload(self, name):
+        """Rebuild a model in a background thread while the current version keeps serving"""
+        if name not in self._paths:
+            raise KeyError(name)
+        thread = threading.Thread(target=self.load, args=(name,), name=f"reload-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def start_profiling(self, name, prefix):
+        """Swap in a version of the model built with onnxruntime's profiler on, served by onnxruntime"""
+        if self._paths[name] is None:
+            raise ValueError(f"Model '{name}' is not an ONNX model")
+        with self._profile_lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.profiling:
+                raise RuntimeError(f"Model '{name}' is already being profiled")
+            return self.load(name, {"profile_prefix": prefix}, engine="onnx")
+
+    def stop_profiling(self, name):
+        """Write the profile of the current version and swap the regular version back in"""
+        if name not in self._paths:
+            raise KeyError(name)
+        with self._profile_lock:
+            entry = self._entries.get(name)
+            if entry is None or not entry.profiling:
+                raise RuntimeError(f"Model '{name}' is not being profiled")
+            # The profiled session keeps serving until the regular version is swapped in
+            path = entry.session.end_profiling()
+            entry.profiling = False
+            self.load(name)
+        return path
+
+    def watch(self, interval=5.0):
+        """Poll model files and reload any that change on disk"""
+        if self._watcher is not None:
+            return
+
+        def poll():
+            while not self._stop_watching.wait(interval):
+                for name, path in list(self._paths.items()):
+                    if path is None or name in self._reloading:
+                        continue
+                    # Compare against the last attempt so a broken file is not retried every poll
+                    stat = _file_stat(path)
+                    if stat is not None and stat != self._attempted_stats.get(name):
+                        print(f"Model file {path} changed, reloading '{name}'")
+                        self.load(name)
+
+        self._watcher = threading.Thread(target=poll, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop_watching.set()
+
+    def status(self):
+        models = {}
+        for name, path in self._paths.items():
+            entry = self._entries.get(name)
+            models[name] = {
+                "path": path,
+                "artifact": entry.artifact if entry is not None else None,
+                "loaded": entry is not None,
+                "kind": entry.kind if entry is not None else None,
+                "engine": self._engines.get(name),
+                "version": entry.version if entry is not None else None,
+                "loaded_at": entry.loaded_at if entry is not None else None,
+                "load_seconds": entry.timings if entry is not None else None,
+                "reloading": name in self._reloading,
+                "profiling": entry.profiling if entry is not None else False,
+                "grid": entry.session.stats() if entry is not None and isinstance(entry.session, GridModel) else None,
+                "error": self._errors.get(name)
+            }
+        return models
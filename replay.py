@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+import numpy as np
+from bench import percentiles, start_server, wait_ready
+
+# Requests replayed concurrently at most, whatever the speed
+DEFAULT_CONCURRENCY = 64
+
+# Paths used when a target serves a single model file under its default name
+DEFAULT_PATHS = {"single": "/predict", "batch": "/predict/batch", "explain": "/predict/explain"}
+
+
+def capture_files(path):
+    """The capture file and its rotated backups, oldest first"""
+    backups = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        backups.append(f"{path}.{index}")
+        index += 1
+    files = list(reversed(backups))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def load_capture(paths, limit=None):
+    """Read captured requests from one or more capture files, in the order they arrived"""
+    entries = []
+    for path in paths:
+        for file_path in capture_files(path):
+            with open(file_path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line of a file that is still being written may be cut off
+                        continue
+                    if entry.pop("body_encoding", None) == "base64":
+                        entry["body"] = base64.b64decode(entry["body"])
+                    else:
+                        entry["body"] = entry["body"].encode("utf-8")
+                    entries.append(entry)
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries[:limit] if limit else entries
+
+
+def _predictions(response):
+    """Predictions from a JSON or packed float32 response, None when there are none to compare"""
+    if response.status_code != 200:
+        return None
+    content_type = response.headers.get("content-type", "")
+    if content_type.startswith("application/octet-stream"):
+        return np.frombuffer(response.content, dtype=np.float32).astype(np.float64)
+    if content_type.startswith("application/json"):
+        body = response.json()
+        if "method" in body:
+            return _explanation_values(body)
+        values = body.get("predictions", body.get("prediction"))
+        return None if values is None else np.asarray(values, dtype=np.float64).reshape(-1)
+    return None
+
+
+def _explanation_values(body):
+    """Baseline prediction, then the prediction and feature contributions of every record, from an explain response"""
+    values = [np.asarray(body["baseline_prediction"], dtype=np.float64).reshape(-1)]
+    for explanation in body.get("explanations", [body]):
+        values.append(np.asarray(explanation["prediction"], dtype=np.float64).reshape(-1))
+        values.extend(np.asarray(value, dtype=np.float64).reshape(-1) for value in explanation["contributions"].values())
+    return np.concatenate(values)
+
+
+class Target:
+    """A server to replay against: a URL, a model file served by this checkout, or another checkout"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.url = spec if spec.startswith(("http://", "https://")) else None
+        self.model_path = os.path.abspath(spec) if spec.endswith(".onnx") else None
+        self.checkout = os.path.abspath(spec) if os.path.isdir(spec) else None
+        if self.url is None and self.model_path is None and self.checkout is None:
+            raise ValueError(f"Target '{spec}' is not a URL, an .onnx file or a directory")
+        self.server = None
+
+    def path(self, entry):
+        # A bare model file is served under one name, so every request goes to the default endpoints
+        if self.model_path is not None:
+            return DEFAULT_PATHS[entry["endpoint"]]
+        return entry["path"]
+
+    def start(self):
+        if self.url is not None:
+            return self.url
+        env = dict(os.environ)
+        # The replayed server must not capture the replay
+        env.pop("CAPTURE_PATH", None)
+        if self.model_path is not None:
+            env["MODELS"] = f"replay={self.model_path}"
+            env["DEFAULT_MODEL"] = "replay"
+        self.server, self.url = start_server(cwd=self.checkout, env=env)
+        return self.url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.terminate()
+            self.server.wait()
+            self.server = None
+
+
+async def replay(client, entries, target, speed=1.0, concurrency=DEFAULT_CONCURRENCY):
+    """Re-issue captured requests on their original schedule divided by speed, 0 for no pauses"""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = [None] * len(entries)
+    first = entries[0]["ts"]
+
+    async def send(index, entry):
+        headers = {key: entry[field] for key, field in (("content-type", "content_type"), ("accept", "accept"), ("x-feature-layout", "layout")) if entry.get(field)}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(target.path(entry), content=entry["body"], headers=headers)
+            except Exception as e:
+                results[index] = {"status": None, "latency": time.perf_counter() - start, "predictions": None, "error": str(e)}
+                return
+            latency = time.perf_counter() - start
+        results[index] = {"status": response.status_code, "latency": latency, "predictions": _predictions(response)}
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = []
+    for index, entry in enumerate(entries):
+        if speed > 0:
+            delay = start + (entry["ts"] - first) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(send(index, entry)))
+    await asyncio.gather(*tasks)
+    return results, loop.time() - start
+
+
+async def run_target(spec, entries, speed, concurrency, warmup=0):
+    import httpx
+
+    target = Target(spec)
+    url = target.start()
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+            await wait_ready(client, url)
+            if warmup:
+                # Open connections and touch the request path before anything is timed
+                await replay(client, entries[:warmup], target, 0, concurrency)
+            return await replay(client, entries, target, speed, concurrency)
+    finally:
+        target.stop()
+
+
+def summarize(entries, results, seconds):
+    ok = [result["latency"] for result in results if result["status"] == 200]
+    return {
+        "requests": len(results),
+        "errors": sum(1 for result in results if result["status"] != 200),
+        "status_matches_capture": sum(1 for entry, result in zip(entries, results) if entry.get("status") == result["status"]),
+        "seconds": seconds,
+        "latency_ms": percentiles(ok)
+    }
+
+
+def compare_predictions(base, new, tolerance):
+    """Count requests whose status or predictions differ between two replays"""
+    compared = 0
+    mismatched = 0
+    status_differs = 0
+    max_difference = 0.0
+    for base_result, new_result in zip(base, new):
+        if base_result["status"] != new_result["status"]:
+            status_differs += 1
+            continue
+        if base_result["predictions"] is None or new_result["predictions"] is None:
+            continue
+        compared += 1
+        if base_result["predictions"].shape != new_result["predictions"].shape:
+            mismatched += 1
+            continue
+        difference = float(np.abs(base_result["predictions"] - new_result["predictions"]).max(initial=0.0))
+        max_difference = max(max_difference, difference)
+        if difference > tolerance:
+            mismatched += 1
+    return {
+        "compared": compared,
+        "mismatched": mismatched,
+        "status_differs": status_differs,
+        "max_abs_difference": max_difference,
+        "tolerance": tolerance
+    }
+
+
+def print_summary(name, spec, summary):
+    latency = summary["latency_ms"]
+    print(f"{name}: {spec}")
+    print(f"  Requests: {summary['requests']} ({summary['errors']} errors) in {summary['seconds']:.2f}s, "
+          f"{summary['status_matches_capture']} with the captured status")
+    if latency:
+        print(f"  Latency ms: p50 {latency['p50']:.2f}  p95 {latency['p95']:.2f}  p99 {latency['p99']:.2f}  max {latency['max']:.2f}")
+
+
+def print_comparison(base, new, predictions):
+    print(f"\n{'metric':<16}{'base':>12}{'new':>12}{'change':>10}")
+    for key in ("p50", "p95", "p99", "mean", "max"):
+        old = base["latency_ms"].get(key)
+        current = new["latency_ms"].get(key)
+        if old is None or current is None:
+            continue
+        change = f"{100 * (current - old) / old:+.1f}%" if old else ""
+        print(f"{key + ' ms':<16}{old:>12.3f}{current:>12.3f}{change:>10}")
+    print(f"{'errors':<16}{base['errors']:>12}{new['errors']:>12}")
+
+    marker = "✓" if predictions["mismatched"] == 0 and predictions["status_differs"] == 0 else "✗"
+    print(f"\n{marker} Predictions: {predictions['compared']} responses compared, {predictions['mismatched']} differ by more than "
+          f"{predictions['tolerance']:g} (max {predictions['max_abs_difference']:.2e}), {predictions['status_differs']} with a different status")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured prediction traffic and compare two models or builds")
+    parser.add_argument("capture", nargs="+", help="Capture files written with CAPTURE_PATH, rotated backups are included")
+    parser.add_argument("--base", required=True, help="URL, .onnx model file or checkout directory to replay against")
+    parser.add_argument("--new", help="Second target to compare with the base")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiple of the captured request rate, 0 to send without pauses")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Most requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=20, help="Captured requests sent before replaying, not measured")
+    parser.add_argument("--limit", type=int, help="Replay only the first N captured requests")
+    parser.add_argument("--tolerance", type=float, default=1e-5, help="Largest prediction difference that still counts as a match")
+    parser.add_argument("-o", "--output", help="Save the comparison as JSON")
+    args = parser.parse_args(argv)
+
+    entries = load_capture(args.capture, args.limit)
+    if not entries:
+        print(f"Error: no captured requests in {', '.join(args.capture)}")
+        return 1
+
+    span = entries[-1]["ts"] - entries[0]["ts"]
+    pace = "without pauses" if args.speed <= 0 else f"at {args.speed:g}x ({span / args.speed:.1f}s)"
+    print(f"=== Replaying {len(entries)} captured requests {pace} ===")
+
+    report = {"capture": args.capture, "speed": args.speed, "requests": len(entries)}
+    # Targets run one after the other so they do not compete for the CPU
+    base_results, seconds = asyncio.run(run_target(args.base, entries, args.speed, args.concurrency, args.warmup))
+    report["base"] = {"target": args.base, **summarize(entries, base_results, seconds)}
+    print_summary("base", args.base, report["base"])
+
+    if args.new:
+        new_results, seconds = asyncio.run(run_target(args.new, entries, args.speed, args.concurrency, args.warmup))
+        report["new"] = {"target": args.new, **summarize(entries, new_results, seconds)}
+        print_summary("new", args.new, report["new"])
+        report["predictions"] = compare_predictions(base_results, new_results, args.tolerance)
+        print_comparison(report["base"], report["new"], report["predictions"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results saved to {args.output}")
+    if args.new and (report["predictions"]["mismatched"] or report["predictions"]["status_differs"]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
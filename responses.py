@@ -0,0 +1,39 @@
+import numpy as np
+import orjson
+from starlette.responses import JSONResponse, Response
+
+# Values of X-Response-Format
+FORMAT_NESTED = "nested"  # {"prediction": [[x]]}, one list per row as the model returns it
+FORMAT_COMPACT = "compact"  # {"prediction": [x]}, the row's outputs as one flat list
+
+# The fixed parts of prediction responses, encoded once
+_PREDICTION_PREFIX = b'{"prediction":'
+_PREDICTIONS_PREFIX = b'{"predictions":'
+_COUNT_INFIX = b',"count":'
+_SUFFIX = b"}"
+
+
+def encode_array(array):
+    """JSON for a float32 array straight from its buffer, without building Python lists"""
+    return orjson.dumps(np.ascontiguousarray(array, dtype=np.float32), option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def prediction_response(result, response_format=FORMAT_NESTED):
+    """Response for /predict, a single row of model output"""
+    if response_format == FORMAT_COMPACT:
+        result = np.asarray(result).reshape(-1)
+    return Response(_PREDICTION_PREFIX + encode_array(result) + _SUFFIX, media_type="application/json")
+
+
+def predictions_response(result):
+    """Response for /predict/batch, every output of every row as one flat list"""
+    predictions = np.asarray(result).reshape(-1)
+    content = _PREDICTIONS_PREFIX + encode_array(predictions) + _COUNT_INFIX + str(len(predictions)).encode() + _SUFFIX
+    return Response(content, media_type="application/json")
+
+
+class NumpyJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, which also takes NumPy arrays and scalars as values"""
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import platform
+
+# onnxruntime is imported on first use so importing the app stays cheap, these map to its enum names
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL"
+}
+
+EXECUTION_MODES = {
+    "sequential": "ORT_SEQUENTIAL",
+    "parallel": "ORT_PARALLEL"
+}
+
+PROVIDERS = ['CPUExecutionProvider']
+
+
+def model_fingerprint(model_path):
+    """Short content hash identifying the model file"""
+    try:
+        with open(model_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    except OSError:
+        return "unavailable"
+
+
+def settings_from_env(overrides=None):
+    """Read session settings from the environment, with optional per-call overrides"""
+    settings = {
+        "intra_op_threads": int(os.getenv("ORT_INTRA_OP_THREADS", "0")),
+        "inter_op_threads": int(os.getenv("ORT_INTER_OP_THREADS", "0")),
+        "execution_mode": os.getenv("ORT_EXECUTION_MODE", "sequential"),
+        "graph_optimization": os.getenv("ORT_GRAPH_OPTIMIZATION", "all"),
+        "enable_mem_arena": os.getenv("ORT_ENABLE_MEM_ARENA", "1") == "1",
+        "enable_mem_pattern": os.getenv("ORT_ENABLE_MEM_PATTERN", "1") == "1",
+        "optimized_model_dir": os.getenv("ORT_OPTIMIZED_MODEL_DIR", ""),
+        # Only set per call, for sessions built to be profiled
+        "profile_prefix": ""
+    }
+    if overrides:
+        settings.update(overrides)
+    if settings["graph_optimization"] not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"ORT_GRAPH_OPTIMIZATION must be one of {', '.join(GRAPH_OPTIMIZATION_LEVELS)}")
+    if settings["execution_mode"] not in EXECUTION_MODES:
+        raise ValueError(f"ORT_EXECUTION_MODE must be one of {', '.join(EXECUTION_MODES)}")
+    return settings
+
+
+def build_session_options(settings):
+    """Translate a settings dict into onnxruntime SessionOptions"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    # 0 leaves the choice to onnxruntime, which uses every core
+    options.intra_op_num_threads = settings["intra_op_threads"]
+    options.inter_op_num_threads = settings["inter_op_threads"]
+    options.execution_mode = getattr(ort.ExecutionMode, EXECUTION_MODES[settings["execution_mode"]])
+    options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[settings["graph_optimization"]])
+    options.enable_cpu_mem_arena = settings["enable_mem_arena"]
+    options.enable_mem_pattern = settings["enable_mem_pattern"]
+    if settings["profile_prefix"]:
+        # onnxruntime writes a Chrome trace of every run to <prefix>_<timestamp>.json on end_profiling()
+        options.enable_profiling = True
+        options.profile_file_prefix = settings["profile_prefix"]
+    return options
+
+
+def optimized_model_path(model_path, settings):
+    """Location of the cached optimized graph for this model, runtime and optimization level"""
+    import onnxruntime as ort
+
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    key = f"{model_fingerprint(model_path)}-ort{ort.__version__}-{settings['graph_optimization']}-{platform.machine()}"
+    return os.path.join(settings["optimized_model_dir"], f"{name}.{key}.onnx")
+
+
+def optimization_report_path(model_path):
+    """Where optimize_model.py writes the report for a model, next to the model file"""
+    return f"{os.path.splitext(model_path)[0]}.optimized.json"
+
+
+def best_artifact(model_path):
+    """The fastest variant the optimization report found equivalent to the model, or the model itself"""
+    report_path = optimization_report_path(model_path)
+    try:
+        with open(report_path) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return model_path
+    # A report for an older version of the model says nothing about the current one
+    if report.get("source_fingerprint") != model_fingerprint(model_path) or not report.get("selected_path"):
+        return model_path
+    artifact = os.path.join(os.path.dirname(report_path), report["selected_path"])
+    return artifact if os.path.exists(artifact) else model_path
+
+
+def create_session(model_path, overrides=None):
+    """Create an InferenceSession, reusing a previously optimized graph when one is cached"""
+    import onnxruntime as ort
+
+    settings = settings_from_env(overrides)
+    options = build_session_options(settings)
+
+    # Weights placed in shared memory by the pre-fork launcher are used in place, not copied per worker
+    from shared_weights import shared_initializers
+    initializers = shared_initializers(model_path)
+    if initializers is not None:
+        for name, value in initializers.items():
+            options.add_initializer(name, value)
+        return ort.InferenceSession(model_path, options, providers=PROVIDERS)
+
+    if not settings["optimized_model_dir"] or settings["graph_optimization"] == "disable":
+        return ort.InferenceSession(model_path, options, providers=PROVIDERS)
+
+    cached_path = optimized_model_path(model_path, settings)
+    if os.path.exists(cached_path):
+        # The cached graph is already optimized, so skip the optimizer passes on load
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        print(f"Loading pre-optimized model from {cached_path}")
+        return ort.InferenceSession(cached_path, options, providers=PROVIDERS)
+
+    # Let onnxruntime write the optimized graph, then move it into place atomically
+    os.makedirs(settings["optimized_model_dir"], exist_ok=True)
+    tmp_path = f"{cached_path}.tmp-{os.getpid()}"
+    options.optimized_model_filepath = tmp_path
+    session = ort.InferenceSession(model_path, options, providers=PROVIDERS)
+    try:
+        os.replace(tmp_path, cached_path)
+        print(f"Saved optimized model to {cached_path}")
+    except OSError as e:
+        print(f"Could not save optimized model: {e}")
+    return session
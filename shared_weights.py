@@ -0,0 +1,63 @@
+import mmap
+import os
+import numpy as np
+from session_config import model_fingerprint
+
+# Byte alignment for each tensor inside the shared buffer
+ALIGNMENT = 64
+
+# Shared weights by absolute model path, filled in the parent before workers fork
+_shared = {}
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SharedWeights:
+    """Initializers of one model copied into an anonymous shared mapping that forked workers inherit"""
+
+    def __init__(self, model_path):
+        import onnx
+        from onnx import numpy_helper
+
+        self.model_path = model_path
+        self.fingerprint = model_fingerprint(model_path)
+        model = onnx.load(model_path)
+        tensors = [(initializer.name, numpy_helper.to_array(initializer)) for initializer in model.graph.initializer]
+        tensors = [(name, array) for name, array in tensors if array.dtype != object]
+
+        # MAP_SHARED | MAP_ANONYMOUS: every forked child sees the same physical pages
+        self._buffer = mmap.mmap(-1, max(1, sum(_aligned(array.nbytes) for _, array in tensors)))
+        self.arrays = {}
+        offset = 0
+        for name, array in tensors:
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=self._buffer, offset=offset)
+            view[...] = array
+            self.arrays[name] = view
+            offset += _aligned(array.nbytes)
+        self.nbytes = offset
+        self._ort_values = None
+
+    def ort_values(self):
+        """OrtValues wrapping the shared arrays without copying, created lazily in each worker"""
+        if self._ort_values is None:
+            import onnxruntime as ort
+
+            self._ort_values = {name: ort.OrtValue.ortvalue_from_numpy(array) for name, array in self.arrays.items()}
+        return self._ort_values
+
+
+def share_model(model_path):
+    """Load a model's initializers into shared memory, call before forking workers"""
+    weights = SharedWeights(model_path)
+    _shared[os.path.abspath(model_path)] = weights
+    return weights
+
+
+def shared_initializers(model_path):
+    """Shared OrtValues for a model, or None if it was not shared or has changed on disk since"""
+    weights = _shared.get(os.path.abspath(model_path))
+    if weights is None or weights.fingerprint != model_fingerprint(model_path):
+        return None
+    return weights.ort_values()
@@ -1,10 +1,148 @@
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
 import uvicorn
 
-if __name__ == "__main__":
+
+def run_dev(args):
+    """Single process with auto-reload, for local development"""
     uvicorn.run(
         "app:app",
-        host="0.0.0.0",
-        port=8000,
+        host=args.host,
+        port=args.port,
         reload=True,
-        log_level="info"
+        log_level=args.log_level
     )
+
+
+def _bind(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker_cpus(index, workers):
+    """Slice of the available CPUs for one worker, or None if there are too few to split"""
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < workers:
+        return None
+    per_worker = len(cpus) // workers
+    return set(cpus[index * per_worker:(index + 1) * per_worker])
+
+
+def _run_worker(index, sock, args, threads):
+    """Body of a forked worker: pin threads, import and warm the app, then serve"""
+    # Every session in this worker gets a fixed share of the cores
+    os.environ["ORT_INTRA_OP_THREADS"] = str(threads)
+    os.environ["ORT_INTER_OP_THREADS"] = "1"
+    os.environ.setdefault("INFERENCE_THREADS", str(max(1, threads)))
+    if args.pin_cpus:
+        cpus = _worker_cpus(index, args.workers)
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # The lifespan startup loads and warms every model before the socket is served
+    config = uvicorn.Config("app:app", log_level=args.log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def _spawn(index, sock, args, threads):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(index, sock, args, threads)
+        except BaseException as e:
+            print(f"Worker {index} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    print(f"Started worker {index} (pid {pid})")
+    return pid
+
+
+def run_prod(args):
+    """Pre-fork workers that share one copy of each model's weights"""
+    from registry import models_from_env
+    from session_config import best_artifact
+    from shared_weights import share_model
+
+    sock = _bind(args.host, args.port)
+
+    # Load weights once in the parent, workers inherit the same pages through fork
+    for name, path in models_from_env():
+        try:
+            # Share the file the workers will actually load
+            if os.getenv("OPTIMIZED_MODELS", "1") == "1":
+                path = best_artifact(path)
+            weights = share_model(path)
+            print(f"Shared {len(weights.arrays)} initializers of '{name}' ({weights.nbytes} bytes)")
+        except Exception as e:
+            print(f"Could not share weights of '{name}' from {path}, workers will load their own: {e}")
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    workers = {}
+    for index in range(args.workers):
+        workers[_spawn(index, sock, args, threads)] = index
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Supervise the workers and replace any that die unexpectedly
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = workers.pop(pid, None)
+        if index is None:
+            continue
+        if not stopping:
+            print(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1)
+            workers[_spawn(index, sock, args, threads)] = index
+    sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the prediction API")
+    parser.add_argument("--prod", action="store_true", help="Production mode: pre-forked workers, no reload")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")), help="Worker processes in production mode")
+    parser.add_argument("--threads-per-worker", type=int, default=0, help="ONNX Runtime threads per worker (default: cores / workers)")
+    parser.add_argument("--pin-cpus", action="store_true", help="Pin each worker to its own slice of the CPUs")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if args.prod:
+        run_prod(args)
+    else:
+        run_dev(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import os
+import time
+from contextlib import contextmanager
+
+
+def process_uptime():
+    """Seconds since this process was started by the OS, or None where /proc is not available"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name can contain spaces, so split after its closing parenthesis
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupReport:
+    """Wall time of each startup phase, in the order the phases ran"""
+
+    def __init__(self):
+        self.phases = []
+        self.started_at = time.perf_counter()
+        # Interpreter start plus whatever the server imported before this module
+        self.before_import = process_uptime()
+        self.ready_after = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    def finish(self):
+        """Mark startup complete and print where the time went"""
+        self.ready_after = time.perf_counter() - self.started_at
+        self.log()
+
+    def to_dict(self):
+        return {
+            "ready": self.ready_after is not None,
+            "before_import_seconds": self.before_import,
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases},
+            "ready_after_seconds": self.ready_after,
+            "total_seconds": (self.before_import or 0.0) + self.ready_after if self.ready_after is not None else None
+        }
+
+    def log(self):
+        print("Startup time report:")
+        if self.before_import is not None:
+            print(f"  {'interpreter and server start':<32} {self.before_import * 1000:9.1f} ms")
+        for name, seconds in self.phases:
+            print(f"  {name:<32} {seconds * 1000:9.1f} ms")
+        if self.ready_after is not None:
+            print(f"  {'ready after import started':<32} {self.ready_after * 1000:9.1f} ms")
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import numpy as np
+from starlette.responses import StreamingResponse
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+# Marks the end of the input stream between the pipeline stages
+_END = object()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streaming response that leaves receive() to the request body reader
+
+    Starlette's StreamingResponse listens for the disconnect by reading receive() itself,
+    which would swallow the request body of a stream that is still being uploaded.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+class OversizedLine:
+    """Stands in for a record whose line is longer than the stream allows, it is reported as an error"""
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def __str__(self):
+        return f"Line exceeds the limit of {self.limit} bytes"
+
+
+async def ndjson_lines(chunks, max_line_bytes=None):
+    """Split a stream of byte chunks into lines, without waiting for the whole body
+
+    Only newly received bytes are searched for a newline, so a long line costs linear time. A line
+    longer than max_line_bytes is dropped as it arrives and yielded as an OversizedLine.
+    """
+    pending = bytearray()
+    # Dropping the rest of an oversized line until its newline
+    skipping = False
+    async for chunk in chunks:
+        start = len(pending)
+        pending += chunk
+        line_start = 0
+        end = pending.find(b"\n", start)
+        while end != -1:
+            line = pending[line_start:end]
+            if skipping:
+                skipping = False
+            elif max_line_bytes is not None and len(line) > max_line_bytes:
+                yield OversizedLine(max_line_bytes)
+            elif line.strip():
+                yield bytes(line)
+            line_start = end + 1
+            end = pending.find(b"\n", line_start)
+        del pending[:line_start]
+        if max_line_bytes is not None and len(pending) > max_line_bytes:
+            if not skipping:
+                yield OversizedLine(max_line_bytes)
+                skipping = True
+            pending.clear()
+    if pending.strip() and not skipping:
+        yield OversizedLine(max_line_bytes) if max_line_bytes is not None and len(pending) > max_line_bytes else bytes(pending)
+
+
+def encode_results(results):
+    return "".join(json.dumps(result) + "\n" for result in results)
+
+
+class PredictionStream:
+    """Score an unbounded stream of records in time-windowed batches, emitting results in input order
+
+    Each stage hands over through a bounded queue, so a consumer that stops reading stalls the
+    pipeline back to the input instead of buffering predictions in memory.
+    """
+
+    def __init__(self, parse_row, predict, window_ms=10.0, max_batch_size=256, max_in_flight=4):
+        # parse_row(item) returns a [6] float32 row or raises ValueError with a message for the client
+        self.parse_row = parse_row
+        # predict(columns) is awaited with [6, N] float32 columns and returns [N, ...] predictions
+        self.predict = predict
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_in_flight = max_in_flight
+        self.records = 0
+        self.errors = 0
+        self.batches = 0
+
+    async def _read(self, items, inbox):
+        try:
+            async for item in items:
+                await inbox.put(item)
+        except Exception:
+            # The batcher still has to finish, run() raises this error when it awaits the reader
+            await inbox.put(_END)
+            raise
+        await inbox.put(_END)
+
+    async def _batch(self, inbox, outbox):
+        loop = asyncio.get_running_loop()
+        index = 0
+        finished = False
+        while not finished:
+            item = await inbox.get()
+            if item is _END:
+                break
+            window = [item]
+            deadline = loop.time() + self.window
+
+            # Collect records until the window closes or the batch is full
+            while len(window) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(inbox.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _END:
+                    finished = True
+                    break
+                window.append(item)
+
+            rows, results = [], []
+            for item in window:
+                try:
+                    if isinstance(item, OversizedLine):
+                        raise ValueError(str(item))
+                    rows.append(self.parse_row(item))
+                    results.append({"index": index})
+                except ValueError as e:
+                    results.append({"index": index, "error": str(e)})
+                    self.errors += 1
+                index += 1
+
+            work = None
+            if rows:
+                # Start the model call now, the writer collects results in order
+                work = asyncio.ensure_future(self.predict(np.stack(rows, axis=1)))
+            self.batches += 1
+            self.records += len(window)
+            await outbox.put((work, results))
+        await outbox.put(_END)
+
+    async def run(self, items):
+        """Async iterator over lists of result dicts, one list per batch, in input order"""
+        inbox = asyncio.Queue(maxsize=self.max_batch_size)
+        outbox = asyncio.Queue(maxsize=self.max_in_flight)
+        reader = asyncio.ensure_future(self._read(items, inbox))
+        batcher = asyncio.ensure_future(self._batch(inbox, outbox))
+        try:
+            while True:
+                entry = await outbox.get()
+                if entry is _END:
+                    break
+                work, results = entry
+                if work is not None:
+                    scored = [result for result in results if "error" not in result]
+                    try:
+                        predictions = np.asarray(await work).reshape(len(scored), -1).tolist()
+                    except Exception as e:
+                        for result in scored:
+                            result["error"] = f"Prediction error: {e}"
+                    else:
+                        for result, prediction in zip(scored, predictions):
+                            result["prediction"] = prediction[0] if len(prediction) == 1 else prediction
+                yield results
+            # Surface errors from reading the input, such as a client disconnect
+            await reader
+        finally:
+            reader.cancel()
+            batcher.cancel()
+            while not outbox.empty():
+                entry = outbox.get_nowait()
+                if entry is not _END and entry[0] is not None:
+                    entry[0].cancel()
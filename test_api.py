@@ -1,5 +1,13 @@
 import requests
 import json
+import asyncio
+import os
+import tempfile
+import time
+import numpy as np
+from starlette.requests import ClientDisconnect
+from streaming import PredictionStream, ndjson_lines
+from inference import FEATURE_NAMES
 
 def test_predict():
     """Test the predict endpoint"""
@@ -24,5 +32,533 @@ def test_predict():
     except Exception as e:
         print(f"Error: {e}")
 
+def test_predict_batch():
+    """Test the batch predict endpoint"""
+    url = "http://localhost:8000/predict/batch"
+    
+    record = {
+        "rainfall": 100.0,
+        "temperature": 25.0,
+        "humidity": 70.0,
+        "soil_ph": 6.5,
+        "fertilizer_usage": 50.0,
+        "risk_score": 0.3
+    }
+    data = {"records": [record, dict(record, rainfall=80.0), dict(record, soil_ph=5.5)]}
+    
+    try:
+        response = requests.post(url, json=data)
+        print(f"Status Code: {response.status_code}")
+        print(f"Response: {response.json()}")
+    except requests.exceptions.ConnectionError:
+        print("Error: Could not connect to the API. Make sure the server is running.")
+    except Exception as e:
+        print(f"Error: {e}")
+
+def test_predict_stream():
+    """Test the NDJSON streaming endpoint"""
+    url = "http://localhost:8000/predict/stream"
+    
+    record = {
+        "rainfall": 100.0,
+        "temperature": 25.0,
+        "humidity": 70.0,
+        "soil_ph": 6.5,
+        "fertilizer_usage": 50.0,
+        "risk_score": 0.3
+    }
+    
+    def readings():
+        # A generator body is sent chunked, like a gateway pushing readings
+        for rainfall in (80.0, 100.0, 120.0):
+            yield (json.dumps(dict(record, rainfall=rainfall)) + "\n").encode()
+    
+    try:
+        response = requests.post(url, data=readings(), headers={"Content-Type": "application/x-ndjson"}, stream=True)
+        print(f"Status Code: {response.status_code}")
+        for line in response.iter_lines():
+            print(f"Result: {json.loads(line)}")
+    except requests.exceptions.ConnectionError:
+        print("Error: Could not connect to the API. Make sure the server is running.")
+    except Exception as e:
+        print(f"Error: {e}")
+
+def test_predict_explain():
+    """Test the explain endpoint"""
+    url = "http://localhost:8000/predict/explain"
+    
+    data = {
+        "rainfall": 20.0,
+        "temperature": 35.0,
+        "humidity": 30.0,
+        "soil_ph": 4.5,
+        "fertilizer_usage": 10.0,
+        "risk_score": 0.8
+    }
+    
+    try:
+        response = requests.post(url, json=data)
+        print(f"Status Code: {response.status_code}")
+        print(f"Response: {response.json()}")
+    except requests.exceptions.ConnectionError:
+        print("Error: Could not connect to the API. Make sure the server is running.")
+    except Exception as e:
+        print(f"Error: {e}")
+
+def test_prediction_stream_disconnect():
+    """Test that a stream whose client disconnects mid-body ends with the error instead of hanging"""
+    record = json.dumps({
+        "rainfall": 100.0,
+        "temperature": 25.0,
+        "humidity": 70.0,
+        "soil_ph": 6.5,
+        "fertilizer_usage": 50.0,
+        "risk_score": 0.3
+    })
+    
+    async def body():
+        # Like request.stream() when the ASGI server reports http.disconnect
+        yield (record + "\n").encode()
+        raise ClientDisconnect()
+    
+    async def predict(columns):
+        return np.ones((columns.shape[1], 1), dtype=np.float32)
+    
+    results = []
+    
+    async def consume():
+        stream = PredictionStream(lambda line: np.array(list(json.loads(line).values()), dtype=np.float32), predict, window_ms=1.0)
+        async for batch in stream.run(ndjson_lines(body())):
+            results.extend(batch)
+    
+    try:
+        asyncio.run(asyncio.wait_for(consume(), 5.0))
+    except ClientDisconnect:
+        pass
+    else:
+        raise AssertionError("The disconnect was not passed to the consumer")
+    assert results == [{"index": 0, "prediction": 1.0}]
+
+def test_replay_explain_capture():
+    """Test that captured explain requests are replayed and their explanations compared"""
+    import httpx
+    from replay import Target, _predictions
+    
+    target = Target("working_agricultural_model.onnx")
+    assert target.path({"endpoint": "explain", "path": "/predict/agricultural/explain"}) == "/predict/explain"
+    
+    contributions = {"rainfall": 0.25, "temperature": -0.5, "humidity": 0.0, "soil_ph": 0.125, "fertilizer_usage": 0.0, "risk_score": 0.0}
+    single = {"method": "linear", "baseline": {}, "baseline_prediction": 0.5, "prediction": 0.375, "contributions": contributions}
+    batch = {"method": "linear", "baseline": {}, "baseline_prediction": 0.5, "explanations": [single, single], "count": 2}
+    assert _predictions(httpx.Response(200, json=single)).tolist() == [0.5, 0.375, 0.25, -0.5, 0.0, 0.125, 0.0, 0.0]
+    assert len(_predictions(httpx.Response(200, json=batch))) == 1 + 2 * 7
+
+def test_micro_batcher_coalesces():
+    """Test that concurrent single-row predictions are merged into one model call"""
+    from batcher import MicroBatcher
+    
+    calls = []
+    
+    def run(columns):
+        calls.append(columns.shape[1])
+        return columns.sum(axis=0).reshape(-1, 1)
+    
+    async def predict(max_batch_size):
+        batcher = MicroBatcher(run, max_batch_size=max_batch_size, max_wait_ms=50.0)
+        try:
+            return await asyncio.gather(*(batcher.submit(np.full(6, i, dtype=np.float32)) for i in range(10)))
+        finally:
+            await batcher.stop()
+    
+    results = asyncio.run(predict(64))
+    assert calls == [10]
+    # Each caller gets the row it submitted back
+    assert [result.item() for result in results] == [6.0 * i for i in range(10)]
+    
+    calls.clear()
+    asyncio.run(predict(4))
+    assert calls == [4, 4, 2]
+    
+    async def timed(run_fn, rows):
+        batcher = MicroBatcher(run_fn, max_batch_size=4, max_wait_ms=500.0)
+        start = time.perf_counter()
+        
+        async def submit(i):
+            # Rows arrive a few milliseconds apart, after the batch has started waiting
+            await asyncio.sleep(0.003 * i)
+            return await batcher.submit(np.full(6, i, dtype=np.float32))
+        
+        try:
+            await asyncio.gather(*(submit(i) for i in range(rows)))
+        finally:
+            await batcher.stop()
+        return time.perf_counter() - start, batcher.stats.to_dict()
+    
+    # A batch that fills flushes right away instead of at the end of the wait window
+    seconds, stats = asyncio.run(timed(run, 4))
+    assert seconds < 0.25 and stats["flushes_full"] == 1
+    
+    # Full batches are scored concurrently, not one model call at a time
+    def slow(columns):
+        time.sleep(0.3)
+        return run(columns)
+    
+    seconds, stats = asyncio.run(timed(slow, 8))
+    assert stats["flushes"] == 2 and seconds < 0.5
+
+def test_prediction_cache_quantization():
+    """Test that the cache hits on readings equal after quantization and misses otherwise"""
+    from cache import LRUBackend, PredictionCache, predict_cached
+    
+    scored = []
+    
+    def run(columns):
+        scored.append(columns.shape[1])
+        return np.asarray(columns[0], dtype=np.float32).reshape(-1, 1)
+    
+    cache = PredictionCache(LRUBackend(), {"rainfall": 1.0})
+    row = np.array([100.2, 25.0, 70.0, 6.5, 50.0, 0.3], dtype=np.float32).reshape(-1, 1)
+    predict_cached(cache, row, run)
+    assert (cache.hits, cache.misses) == (0, 1)
+    
+    # 99.9 rounds to the same rainfall step, so the first reading's prediction is served
+    same = row.copy()
+    same[0] = 99.9
+    assert predict_cached(cache, same, run).item() == np.float32(100.2)
+    assert (cache.hits, cache.misses, scored) == (1, 1, [1])
+    
+    # Another rainfall step, or a change in an unquantized feature, is scored
+    other = np.concatenate([row, row], axis=1)
+    other[0, 0] = 101.0
+    other[1, 1] = 25.5
+    predict_cached(cache, other, run)
+    assert (cache.hits, cache.misses, scored) == (1, 3, [1, 2])
+    
+    # A new model version drops every entry
+    cache.invalidate("v2")
+    predict_cached(cache, row, run)
+    assert (cache.hits, cache.misses) == (1, 4)
+    
+    # Lookups from the event loop and inference threads at once are all counted
+    from concurrent.futures import ThreadPoolExecutor
+    keys = cache.keys(row)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: cache.lookup(keys * 100), range(200)))
+    assert cache.stats()["hits"] == 1 + 200 * 100
+
+def _save_model(path, weights, interaction=False):
+    """Write a model over the six feature inputs: the sigmoid of a weighted sum, plus rainfall * temperature with interaction"""
+    import onnx
+    from onnx import TensorProto, helper
+    
+    inputs = [helper.make_tensor_value_info(feature, TensorProto.FLOAT, ["batch", 1]) for feature in FEATURE_NAMES]
+    output = helper.make_tensor_value_info("yield_prediction", TensorProto.FLOAT, ["batch", 1])
+    initializers = [helper.make_tensor(f"{feature}_weight", TensorProto.FLOAT, [1], [weight]) for feature, weight in zip(FEATURE_NAMES, weights)]
+    nodes = [helper.make_node("Mul", [feature, f"{feature}_weight"], [f"{feature}_scaled"]) for feature in FEATURE_NAMES]
+    terms = [f"{feature}_scaled" for feature in FEATURE_NAMES]
+    if interaction:
+        nodes.append(helper.make_node("Mul", ["rainfall", "temperature"], ["interaction"]))
+        terms.append("interaction")
+    total = terms[0]
+    for i, term in enumerate(terms[1:]):
+        nodes.append(helper.make_node("Add", [total, term], [f"sum{i}"]))
+        total = f"sum{i}"
+    nodes.append(helper.make_node("Sigmoid", [total], ["yield_prediction"]))
+    graph = helper.make_graph(nodes, "test_model", inputs, [output], initializers)
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)]), path)
+
+def test_model_hot_reload():
+    """Test that a changed model file is picked up and swapped in while the old version serves"""
+    from inference import run_batch
+    from registry import ModelRegistry
+    
+    row = np.zeros((6, 1), dtype=np.float32)
+    row[0] = 1.0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.onnx")
+        _save_model(path, [0.0] * 6)
+        registry = ModelRegistry(use_optimized=False)
+        registry.register("field", path)
+        swapped = []
+        registry.add_listener(swapped.append)
+        assert registry.load("field")
+        old = registry.get("field")
+        assert run_batch(old.session, row).item() == 0.5
+        
+        # A new file on disk is noticed by the watcher and rebuilt in the background
+        registry.watch(0.05)
+        try:
+            _save_model(path, [2.0] + [0.0] * 5)
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+            deadline = time.monotonic() + 10.0
+            while registry.get("field") is old and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            registry.stop()
+        new = registry.get("field")
+        assert new is not old and new.version != old.version
+        assert abs(run_batch(new.session, row).item() - 1.0 / (1.0 + np.exp(-2.0))) < 1e-6
+        assert swapped == [old, new]
+        # The old version still answers for requests that already hold it
+        assert run_batch(old.session, row).item() == 0.5
+
+def test_executor_sheds_load_and_deadlines():
+    """Test that the inference executor rejects work beyond its queue bound and drops work past its deadline"""
+    import threading
+    from executor import DeadlineExceeded, InferenceExecutor, Overloaded
+    
+    executor = InferenceExecutor(max_workers=1, max_pending=1, retry_after=2)
+    release = threading.Event()
+    
+    async def scenario():
+        with executor.admit():
+            # The only slot is taken, the next request is shed at once
+            try:
+                with executor.admit():
+                    pass
+            except Overloaded as e:
+                assert e.retry_after == 2
+            else:
+                raise AssertionError("A request beyond max_pending was admitted")
+            
+            # The worker is stuck, so the request gives up at its deadline
+            blocked = executor.run(release.wait, 5.0)
+            try:
+                await executor.wait(blocked, 0.05)
+            except DeadlineExceeded:
+                pass
+            else:
+                raise AssertionError("The deadline was not enforced")
+        # The slot is free again once the request is done
+        with executor.admit():
+            pass
+    
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
+    stats = executor.stats()
+    assert (stats["rejected"], stats["timed_out"], stats["pending"]) == (1, 1, 0)
+
+def test_numpy_engine_parity():
+    """Test that the NumPy engine matches ONNX Runtime and falls back on graphs it cannot compile"""
+    from fast_path import parity_rows, select_engine
+    from inference import run_batch
+    from session_config import create_session
+    
+    columns = parity_rows(1024, seed=1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "linear.onnx")
+        _save_model(path, [0.002, -0.01, 0.005, 0.1, -0.003, 1.5])
+        session = create_session(path)
+        runner, kind = select_engine(session, path)
+        assert kind == "numpy" and runner is not session
+        expected = run_batch(session, columns)
+        actual = run_batch(runner, columns)
+        assert actual.shape == expected.shape
+        assert np.allclose(actual, expected, rtol=1e-4, atol=1e-5)
+        
+        # rainfall * temperature is not affine, so the session is served as is
+        path = os.path.join(directory, "interaction.onnx")
+        _save_model(path, [0.002, -0.01, 0.005, 0.1, -0.003, 1.5], interaction=True)
+        session = create_session(path)
+        runner, kind = select_engine(session, path)
+        assert kind == "onnx" and runner is session
+
+def test_ndjson_lines_limit():
+    """Test that streamed lines are split across chunks and overlong lines become error records"""
+    from streaming import OversizedLine
+    
+    async def chunks(data, size):
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+    
+    async def lines(data, size, max_line_bytes):
+        return [line if isinstance(line, bytes) else str(line) async for line in ndjson_lines(chunks(data, size), max_line_bytes)]
+    
+    assert asyncio.run(lines(b"a\nbb\n\nccc", 2, None)) == [b"a", b"bb", b"ccc"]
+    # The rest of an overlong line is dropped up to its newline, the next line is read as usual
+    error = str(OversizedLine(10))
+    assert asyncio.run(lines(b"a\n" + b"x" * 50 + b"\nb\n" + b"y" * 20, 7, 10)) == [b"a", error, b"b", error]
+    
+    # A 20 MB line without a newline is dropped as it arrives instead of being rescanned per chunk
+    start = time.perf_counter()
+    assert asyncio.run(lines(b"x" * 20_000_000 + b"\nq\n", 65536, 65536)) == [str(OversizedLine(65536)), b"q"]
+    assert time.perf_counter() - start < 2.0
+
+def test_feature_schema_errors():
+    """Test the column-wise validator's error types and locations for records, columns and single records"""
+    from feature_schema import FeatureSchema
+    
+    schema = FeatureSchema.load()
+    record = {
+        "rainfall": 100.0,
+        "temperature": 25.0,
+        "humidity": 70.0,
+        "soil_ph": 6.5,
+        "fertilizer_usage": 50.0,
+        "risk_score": 0.3
+    }
+    
+    columns, errors = schema.columns_from_records([record, dict(record, rainfall=80.0)], ("body", "records"))
+    assert errors == [] and columns.shape == (6, 2) and columns.dtype == np.float32
+    
+    # null, a string that is not a number and a missing field, each located by row and feature
+    records = [record, dict(record, rainfall=None, humidity="wet"), {k: v for k, v in record.items() if k != "soil_ph"}]
+    columns, errors = schema.columns_from_records(records, ("body", "records"))
+    assert columns is None
+    assert [(error["type"], error["loc"]) for error in errors] == [
+        ("float_type", ["body", "records", 1, "rainfall"]),
+        ("float_parsing", ["body", "records", 1, "humidity"]),
+        ("missing", ["body", "records", 2, "soil_ph"])
+    ]
+    
+    # A single record reports without the row index
+    _, errors = schema.columns_from_record(dict(record, temperature=None), ("body",))
+    assert [(error["type"], error["loc"], error["msg"]) for error in errors] == [("float_type", ["body", "temperature"], "Input should be a valid number")]
+    
+    mapping = {feature: [value, value] for feature, value in record.items()}
+    columns, errors = schema.columns_from_mapping(mapping, ("body", "columns"))
+    assert errors == [] and columns.shape == (6, 2)
+    _, errors = schema.columns_from_mapping(dict(mapping, temperature=[1.0, None], risk_score=[0.1]), ("body", "columns"))
+    assert [(error["type"], error["loc"]) for error in errors] == [("float_type", ["body", "columns", "temperature", 1])]
+    _, errors = schema.columns_from_mapping(dict(mapping, risk_score=[0.1]), ("body", "columns"))
+    assert [error["msg"] for error in errors] == ["All feature columns must have the same length"]
+    
+    # Range, NaN and infinity are reported per row and feature, in row order
+    columns = np.repeat(np.array(list(record.values()), dtype=np.float32).reshape(-1, 1), 4, axis=1)
+    columns[3, 1] = 15.0
+    columns[0, 2] = np.nan
+    columns[5, 3] = np.inf
+    errors, count = schema.range_errors(columns, ("body",))
+    assert count == 3
+    assert [(error["type"], error["loc"], error["input"]) for error in errors] == [
+        ("out_of_range", ["body", 1, "soil_ph"], 15.0),
+        ("finite_number", ["body", 2, "rainfall"], "nan"),
+        ("finite_number", ["body", 3, "risk_score"], "inf")
+    ]
+    assert errors[0]["msg"] == "Input should be between 0.0 and 14.0"
+
+def test_prediction_grid():
+    """Test grid lookups against live scoring, interpolation on grid points and invalidation of the saved table"""
+    from inference import run_batch
+    from prediction_grid import GridModel, PredictionGrid, parse_grid
+    from session_config import create_session
+    
+    # Evenly spaced axes are indexed arithmetically, the uneven ones by binary search
+    axes = parse_grid("rainfall=0:200:50,temperature=10|20|35,humidity=50:70:10,soil_ph=5:7:0.1,fertilizer_usage=0|100,risk_score=0:0.3:0.1")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.onnx")
+        _save_model(path, [0.002, -0.01, 0.005, 0.1, -0.003, 1.5])
+        session = create_session(path)
+        grid = PredictionGrid.build(session, axes, "v1")
+        assert grid.cells == 5 * 3 * 3 * 21 * 2 * 4
+        
+        on_grid = np.stack([axis[rng.integers(0, len(axis), 200)] for axis in axes])
+        off_grid = on_grid.copy()
+        off_grid[3, ::2] += np.float32(0.05)
+        off_grid[1, 1::2] = 15.0
+        model = GridModel(session, grid)
+        assert np.allclose(run_batch(model, on_grid), run_batch(session, on_grid), atol=1e-6)
+        assert (model.hits, model.misses) == (200, 0)
+        # Rows off the grid are scored live, in a batch mixed with rows on it
+        mixed = np.concatenate([on_grid[:, :50], off_grid[:, :50]], axis=1)
+        assert np.allclose(run_batch(model, mixed), run_batch(session, mixed), atol=1e-6)
+        assert (model.hits, model.misses) == (250, 50)
+        
+        # Interpolation lands exactly on the table at grid points, rows outside the grid's range miss
+        values, hit = grid.lookup(on_grid, interpolate=True)
+        assert hit.all() and np.allclose(values, run_batch(session, on_grid), atol=1e-6)
+        outside = on_grid[:, :3].copy()
+        outside[0] = [-1.0, 250.0, 100.0]
+        assert not grid.lookup(outside, interpolate=True)[1][:2].any()
+        
+        table_path = os.path.join(directory, "model.grid.npz")
+        grid.save(table_path)
+        assert np.array_equal(PredictionGrid.load(table_path, axes, "v1").table, grid.table)
+        assert PredictionGrid.load(table_path, axes, "v2") is None
+        assert PredictionGrid.load(table_path, axes[:5] + [axes[5][:-1]], "v1") is None
+        assert PredictionGrid.load(os.path.join(directory, "missing.grid.npz"), axes, "v1") is None
+
+def test_columnar_decoding():
+    """Test packed float32 and Arrow decoding and the negotiation of binary responses"""
+    import pyarrow as pa
+    import columnar
+    
+    rows = np.arange(18, dtype=np.float32).reshape(3, 6)
+    columns = columnar.decode_float32(np.ascontiguousarray(rows.T).astype("<f4").tobytes())
+    assert np.array_equal(columns, rows.T)
+    columns = columnar.decode_float32(rows.astype("<f4").tobytes(), columnar.LAYOUT_ROWS)
+    assert np.array_equal(columns, rows.T) and columns.flags["C_CONTIGUOUS"]
+    for body, layout in ((rows.tobytes()[:-4], columnar.LAYOUT_COLUMNS), (b"", columnar.LAYOUT_COLUMNS), (rows.tobytes(), "diagonal")):
+        try:
+            columnar.decode_float32(body, layout)
+        except columnar.ColumnarFormatError:
+            pass
+        else:
+            raise AssertionError(f"Decoded a bad float32 body ({len(body)} bytes, layout {layout})")
+    
+    def arrow_body(**overrides):
+        arrays = {feature: pa.array(rows[:, i].astype(np.float64)) for i, feature in enumerate(FEATURE_NAMES)}
+        arrays.update(overrides)
+        arrays = {name: array for name, array in arrays.items() if array is not None}
+        batch = pa.record_batch(list(arrays.values()), names=list(arrays))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+    
+    # float64 columns are cast to float32
+    columns = columnar.decode_arrow(arrow_body())
+    assert all(column.dtype == np.float32 for column in columns)
+    assert np.array_equal(np.stack(columns), rows.T)
+    for overrides, message in (
+        ({"rainfall": pa.array([1.0, None, 3.0])}, "contains nulls"),
+        ({"soil_ph": pa.array(["acid", "neutral", "alkaline"])}, "cannot be read as float32"),
+        ({"humidity": None}, "missing columns: humidity")
+    ):
+        try:
+            columnar.decode_arrow(arrow_body(**overrides))
+        except columnar.ColumnarFormatError as e:
+            assert message in str(e), str(e)
+        else:
+            raise AssertionError(f"Decoded an Arrow stream that should fail with '{message}'")
+    
+    assert columnar.binary_response_type(None) is None
+    assert columnar.binary_response_type("application/json") is None
+    assert columnar.binary_response_type("application/octet-stream; q=0.9") == columnar.FLOAT32_CONTENT_TYPE
+    assert columnar.binary_response_type("application/octet-stream, application/vnd.apache.arrow.stream") == columnar.ARROW_CONTENT_TYPE
+    
+    # Without pyarrow, Arrow falls back to another accepted format or is refused
+    available = columnar.arrow_available
+    columnar.arrow_available = lambda: False
+    try:
+        assert columnar.binary_response_type("application/vnd.apache.arrow.stream, application/octet-stream") == columnar.FLOAT32_CONTENT_TYPE
+        assert columnar.binary_response_type("application/vnd.apache.arrow.stream, application/json") is None
+        try:
+            columnar.binary_response_type("application/vnd.apache.arrow.stream")
+        except columnar.ColumnarFormatError:
+            pass
+        else:
+            raise AssertionError("Arrow output was accepted without pyarrow")
+    finally:
+        columnar.arrow_available = available
+
 if __name__ == "__main__":
     test_predict()
+    test_predict_batch()
+    test_predict_stream()
+    test_predict_explain()
+    test_prediction_stream_disconnect()
+    test_ndjson_lines_limit()
+    test_replay_explain_capture()
+    test_micro_batcher_coalesces()
+    test_prediction_cache_quantization()
+    test_model_hot_reload()
+    test_executor_sheds_load_and_deadlines()
+    test_numpy_engine_parity()
+    test_feature_schema_errors()
+    test_prediction_grid()
+    test_columnar_decoding()